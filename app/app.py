@@ -1,11 +1,16 @@
 import os
+import json
+import itertools
+import threading
 import traceback
+from datetime import datetime, timezone
+from functools import partial
 from urllib.parse import quote
 from flask import Flask, jsonify, request, send_file, render_template, Response
 from dotenv import load_dotenv
 load_dotenv()
 
-from . import utils, extract, ocr as ocrmod, cleanup as cleanupmod, wp_client
+from . import utils, extract, ocr as ocrmod, cleanup as cleanupmod, wp_client, catalog as catalogmod, progress as progressmod, prefetch as prefetchmod, cache as cachemod, jobs as jobsmod, post_index as post_indexmod, wp_mirror, ocr_rules
 
 app = Flask(__name__)
 
@@ -15,48 +20,94 @@ if not PROGRESS_LOG:
     # Default to progress_log.csv in project root
     PROGRESS_LOG = os.path.join(os.path.dirname(os.path.dirname(__file__)), "progress_log.csv")
 PROGRESS_LOG = PROGRESS_LOG.strip()
+PROGRESS_BACKEND = os.getenv("PROGRESS_BACKEND", "csv").strip().lower()  # csv | sqlite
+PROGRESS_DB = (os.getenv("PROGRESS_DB") or os.path.splitext(PROGRESS_LOG)[0] + ".sqlite3").strip()
 CATEGORY_NAME = os.getenv("WP_CATEGORY_NAME", "Phyllis Schlafly Report Column")  # Default to hardcoded name
 AUTHOR_NAME = os.getenv("WP_AUTHOR_NAME", "")
+CATALOG_WORKERS = int(os.getenv("CATALOG_WORKERS", "4") or 0)  # Parallel year-folder scan; 0/1 = serial
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "30") or 0)  # Min gap between auto-refreshes
+PREFETCH_COUNT = int(os.getenv("PREFETCH_COUNT", "3") or 0)  # Upcoming items to extract ahead; 0 disables
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2") or 1)
+OCR_HYBRID = os.getenv("OCR_HYBRID", "1").strip().lower() in ("1", "true", "yes")  # OCR weak text-layer pages automatically
+OCR_JOB_WORKERS = int(os.getenv("OCR_JOB_WORKERS", "1") or 1)  # Documents OCR'd concurrently by /api/ocr/jobs
+PREFETCH_CACHE_SIZE = int(os.getenv("PREFETCH_CACHE_SIZE", "32") or 1)
+WP_MIRROR_PATH = (os.getenv("WP_MIRROR") or os.path.join(os.path.dirname(os.path.dirname(__file__)), ".wp_mirror.sqlite3")).strip()
+PDF_PREVIEWS = os.getenv("PDF_PREVIEWS", "1").strip().lower() in ("1", "true", "yes")  # Low-res page 1 shown while the PDF loads
+SOURCE_MAX_AGE = 365 * 24 * 3600  # Versioned (?v=) source URLs never change, so browsers may keep them
+CATALOG_INDEX_PATH = (os.getenv("CATALOG_INDEX_PATH") or os.path.join(os.path.dirname(os.path.dirname(__file__)), ".catalog_index.json")).strip()
 
 # Debug: Print configuration
 print(f"DEBUG - SOURCE_ROOT: '{SOURCE_ROOT}'")
 print(f"DEBUG - SOURCE_ROOT exists: {os.path.exists(SOURCE_ROOT) if SOURCE_ROOT else False}")
 print(f"DEBUG - PROGRESS_LOG: '{PROGRESS_LOG}'")
+print(f"DEBUG - PROGRESS_BACKEND: '{PROGRESS_BACKEND}'" + (f" ({PROGRESS_DB})" if PROGRESS_BACKEND == "sqlite" else ""))
+print(f"DEBUG - CATALOG_INDEX_PATH: '{CATALOG_INDEX_PATH}'")
 
-CATALOG = utils.list_items(SOURCE_ROOT)
-print(f"DEBUG - CATALOG length: {len(CATALOG)}")
-if CATALOG:
-    print(f"DEBUG - First item: {CATALOG[0]}")
-else:
-    print("DEBUG - No items found in catalog")
+# Loaded lazily on first use (snapshot + revalidation), so --reload restarts stay cheap
+CATALOG_STATE = catalogmod.Catalog(SOURCE_ROOT, workers=CATALOG_WORKERS, index_path=CATALOG_INDEX_PATH)
+# Both are updated in place by CATALOG_STATE.refresh()
+CATALOG = CATALOG_STATE.items
+CATALOG_INDEX = CATALOG_STATE.index
+PROGRESS = progressmod.open_store(PROGRESS_BACKEND, PROGRESS_LOG, PROGRESS_DB)
+OCR_JOBS = jobsmod.JobQueue(workers=OCR_JOB_WORKERS)
+WP_MIRROR = wp_mirror.PostMirror(WP_MIRROR_PATH) if WP_MIRROR_PATH.lower() not in ("", "0", "off") else None
+threading.Thread(target=wp_client.warm_resolution_cache, name="wp-warm", daemon=True).start()
+# Run by the prefetcher's background workers only: /api/next serves the plain text layer rather than
+# waiting on an extraction (and so on Tesseract) that isn't finished. A failed OCR keeps the text layer.
+ITEM_TEXT_LOADER = partial(extract.extract_item_text, pdf_loader=ocrmod.ocr_pdf_hybrid) if OCR_HYBRID else extract.extract_item_text
+
+def _load_item(item):
+    # Prefetching an item also renders its PDF preview into the preview cache
+    if PDF_PREVIEWS and item.get("pdf_path"):
+        try: extract.pdf_preview_png(item["pdf_path"])
+        except Exception as e: print(f"DEBUG preview - {item['basename']}: {e}")
+    return ITEM_TEXT_LOADER(item)
+
+PREFETCHER = prefetchmod.TextPrefetcher(_load_item, workers=PREFETCH_WORKERS, capacity=PREFETCH_CACHE_SIZE)
+
+def _file_version(path: str) -> str:
+    try: st = os.stat(path)
+    except OSError: return ""
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+def _source_cache_headers(resp, version: str):
+    """Immutable caching when the URL carries the file's current version, else revalidate every time."""
+    if version and request.args.get("v") == version:
+        resp.cache_control.no_cache = None
+        resp.cache_control.public = True
+        resp.cache_control.max_age = SOURCE_MAX_AGE
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    return resp
 
 @app.route("/")
 def index(): return render_template("index.html")
 
 @app.get("/api/next")
 def api_next():
-    global CATALOG
     print(f"DEBUG /api/next - SOURCE_ROOT: '{SOURCE_ROOT}'")
     if not SOURCE_ROOT: return jsonify({"error":"SOURCE_ROOT not configured in .env"}), 500
-    if not CATALOG: 
-        CATALOG = utils.list_items(SOURCE_ROOT)
-        print(f"DEBUG /api/next - Reloaded CATALOG length: {len(CATALOG)}")
-    done = utils.read_done_set(PROGRESS_LOG)
-    print(f"DEBUG /api/next - Done set size: {len(done)}")
+    delta = CATALOG_STATE.refresh() if not CATALOG else CATALOG_STATE.maybe_refresh(CATALOG_REFRESH_SECONDS)
+    if delta and (delta["added"] or delta["removed"] or delta["updated"]):
+        print(f"DEBUG /api/next - Catalog refreshed: +{len(delta['added'])} -{len(delta['removed'])} ~{len(delta['updated'])}, length {len(CATALOG)}")
+    next_item = PROGRESS.next_item(CATALOG, CATALOG_STATE.version)
+    print(f"DEBUG /api/next - Done set size: {len(PROGRESS.done)}")
     print(f"DEBUG /api/next - Total CATALOG size: {len(CATALOG)}")
-    next_item = next((it for it in CATALOG if it["basename"] not in done), None)
     print(f"DEBUG /api/next - Next item: {next_item}")
     if not next_item: return jsonify({"message":"All done!", "finished": True})
 
-    initial_text = ""
-    if next_item.get("pdf_path"):
-        try: initial_text = extract.extract_pdf_text(next_item["pdf_path"])
-        except Exception: initial_text = ""
-    if not initial_text and next_item.get("docx_path"):
-        try: initial_text = extract.extract_docx_text(next_item["docx_path"])
-        except Exception: initial_text = initial_text or ""
+    # Unless the prefetched text is ready, serve the plain text layer now; the hybrid/OCR text keeps loading
+    initial_text = PREFETCHER.get(next_item, fallback=extract.extract_item_text if OCR_HYBRID else None)
+    if PREFETCH_COUNT > 0:
+        # Extract the following items while the operator works on this one
+        PREFETCHER.prefetch(PROGRESS.upcoming(CATALOG, PREFETCH_COUNT + 1, CATALOG_STATE.version)[1:])
 
-    pdf_url = f"/source/pdf?path={quote(next_item['pdf_path'])}" if next_item.get("pdf_path") else None
+    pdf_url = preview_url = None
+    if next_item.get("pdf_path"):
+        source = f"path={quote(next_item['pdf_path'])}&v={_file_version(next_item['pdf_path'])}"
+        pdf_url = f"/source/pdf?{source}"
+        if PDF_PREVIEWS: preview_url = f"/source/pdf/preview?{source}&page=1"
     docx_html_url = f"/source/docx_html?path={quote(next_item['docx_path'])}" if next_item.get("docx_path") else None
 
     return jsonify({
@@ -65,11 +116,35 @@ def api_next():
         "date_parsed": next_item["date_parsed"],
         "has_pdf": bool(next_item.get("pdf_path")),
         "has_docx": bool(next_item.get("docx_path")),
-        "pdf_url": pdf_url, "docx_html_url": docx_html_url,
+        "pdf_url": pdf_url, "pdf_preview_url": preview_url, "docx_html_url": docx_html_url,
         "initial_text": initial_text,
         "category": CATEGORY_NAME, "author": AUTHOR_NAME
     })
 
+@app.post("/api/catalog/refresh")
+def api_catalog_refresh():
+    if not SOURCE_ROOT: return jsonify({"error":"SOURCE_ROOT not configured in .env"}), 500
+    delta = CATALOG_STATE.refresh()
+    delta["total"] = len(CATALOG)
+    return jsonify(delta)
+
+@app.get("/api/prefetch/stats")
+def api_prefetch_stats(): return jsonify(PREFETCHER.stats())
+
+@app.get("/api/cache/stats")
+def api_cache_stats():
+    cache = cachemod.default_cache()
+    return jsonify(cache.stats() if cache else {"enabled": False})
+
+@app.get("/api/ocr/rules/stats")
+def api_ocr_rules_stats():
+    rules = ocr_rules.default_rules()
+    return jsonify(rules.stats() if rules else {"enabled": False})
+
+@app.get("/api/wp/metrics")
+def api_wp_metrics():
+    return jsonify(wp_client.metrics())
+
 @app.post("/api/cleanup")
 def api_cleanup():
     text = request.get_json(force=True).get("text","")
@@ -78,9 +153,69 @@ def api_cleanup():
 @app.post("/api/ocr")
 def api_ocr():
     basename = request.get_json(force=True).get("basename")
-    item = next((x for x in CATALOG if x["basename"] == basename), None)
+    CATALOG_STATE.ensure_loaded()
+    item = CATALOG_INDEX.get(basename)
+    if not item or not item.get("pdf_path"): return jsonify({"error":"PDF not found"}), 404
+    try:
+        text = ocrmod.ocr_pdf_to_text(item["pdf_path"],
+                                      progress=lambda done, total: print(f"DEBUG /api/ocr - {basename}: page {done}/{total}"))
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 504
+    return jsonify({"text": text})
+
+def _reraise(e): raise e
+
+def _job_json(job):
+    return {"id": job["id"], "basename": job["basename"], "status": job["status"],
+            "done": job["done"], "total": job["total"], "error": job["error"],
+            "text": job["result"] if job["status"] == "done" else None}
+
+@app.post("/api/ocr/jobs")
+def api_ocr_jobs_submit():
+    data = request.get_json(force=True)
+    basename = data.get("basename"); mode = data.get("mode", "full")
+    if mode not in ("full", "hybrid"): return jsonify({"error":"mode must be 'full' or 'hybrid'"}), 400
+    CATALOG_STATE.ensure_loaded()
+    item = CATALOG_INDEX.get(basename)
     if not item or not item.get("pdf_path"): return jsonify({"error":"PDF not found"}), 404
-    return jsonify({"text": ocrmod.ocr_pdf_to_text(item["pdf_path"])})
+    # An explicit Re-OCR reports OCR failures instead of quietly returning the text layer
+    run = partial(ocrmod.ocr_pdf_hybrid, on_error=_reraise) if mode == "hybrid" else ocrmod.ocr_pdf_to_text
+    pdf_path = item["pdf_path"]
+    job_id = OCR_JOBS.submit(lambda progress: run(pdf_path, progress=progress), basename=basename, mode=mode)
+    return jsonify({"id": job_id, "status_url": f"/api/ocr/jobs/{job_id}", "events_url": f"/api/ocr/jobs/{job_id}/events"}), 202
+
+@app.get("/api/ocr/jobs/<job_id>")
+def api_ocr_job(job_id):
+    job = OCR_JOBS.get(job_id)
+    if not job: return jsonify({"error":"Job not found"}), 404
+    return jsonify(_job_json(job))
+
+@app.get("/api/ocr/jobs/<job_id>/events")
+def api_ocr_job_events(job_id):
+    job = OCR_JOBS.get(job_id)
+    if not job: return jsonify({"error":"Job not found"}), 404
+
+    def stream(job):
+        # One "progress" event per update, then a final "done" event (status done or error) with the text
+        last_rev = None
+        while True:
+            if job["status"] in jobsmod.TERMINAL:
+                yield f"event: done\ndata: {json.dumps(_job_json(job))}\n\n"
+                return
+            if job["rev"] != last_rev:
+                yield f"event: progress\ndata: {json.dumps(_job_json(job))}\n\n"
+                last_rev = job["rev"]
+            else:
+                yield ": keep-alive\n\n"
+            job = OCR_JOBS.wait_for_change(job_id, last_rev)
+            if job is None:
+                # Evicted from the queue's history mid-stream; still end with a "done" event so the client stops
+                gone = {"id": job_id, "status": "error", "error": "Job no longer available", "text": None}
+                yield f"event: done\ndata: {json.dumps(gone)}\n\n"
+                return
+
+    return Response(stream(job), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 def _post_common(kind: str):
     data = request.get_json(force=True)
@@ -88,11 +223,12 @@ def _post_common(kind: str):
     title = data.get("title","").strip(); date_iso = data.get("date","").strip()
     content = data.get("content","")
 
-    item = next((x for x in CATALOG if x["basename"] == basename), None)
+    CATALOG_STATE.ensure_loaded()
+    item = CATALOG_INDEX.get(basename)
     has_pdf = bool(item and item.get("pdf_path")); has_docx = bool(item and item.get("docx_path"))
 
     if kind == "skip":
-        utils.append_log(PROGRESS_LOG, {
+        PROGRESS.append({
             "year_folder": year_folder, "basename": basename, "has_pdf": has_pdf, "has_docx": has_docx,
             "date_parsed": date_iso, "title": title, "status": "skipped",
             "ocr_used": False, "cleanup_applied": False, "author_set": False, "wp_post_id": "", "wp_url": ""
@@ -102,18 +238,24 @@ def _post_common(kind: str):
     if not title or not date_iso: return jsonify({"error":"Title and date required"}), 400
     status = "publish" if kind=="publish" else "draft"
     try:
-        res = wp_client.create_post(title=title, content=content, date_iso=utils.iso_local_noon(date_iso), status=status)
-        utils.append_log(PROGRESS_LOG, {
+        index = post_indexmod.default_index()
+        publish = index.publish if index else wp_client.create_post
+        res = publish(title=title, content=content, date_iso=utils.iso_local_noon(date_iso), status=status)
+        PROGRESS.append({
             "year_folder": year_folder, "basename": basename, "has_pdf": has_pdf, "has_docx": has_docx,
             "date_parsed": date_iso, "title": title, "status": "published" if status=="publish" else "draft",
             "ocr_used": False, "cleanup_applied": False, "author_set": res.get("author_set", False),
             "wp_post_id": res.get("id",""), "wp_url": res.get("URL","")
         })
-        return jsonify({"message": f"{status.title()}ed.", "id": res.get("id"), "url": res.get("URL")})
+        if res.get("duplicate"):
+            message = f"Already on WordPress as post {res.get('id')}; " + ("updated." if post_indexmod.WP_ON_DUPLICATE == "update" else "not posted again.")
+        else:
+            message = f"{status.title()}ed."
+        return jsonify({"message": message, "id": res.get("id"), "url": res.get("URL"), "duplicate": bool(res.get("duplicate"))})
     except Exception as e:
         print(f"ERROR in _post_common: {str(e)}")
         traceback.print_exc()
-        utils.append_log(PROGRESS_LOG, {
+        PROGRESS.append({
             "year_folder": year_folder, "basename": basename, "has_pdf": has_pdf, "has_docx": has_docx,
             "date_parsed": date_iso, "title": title, "status": "error",
             "ocr_used": False, "cleanup_applied": False, "author_set": False, "wp_post_id": "", "wp_url": "", "error_message": str(e)
@@ -131,8 +273,11 @@ def api_skip(): return _post_common("skip")
 
 @app.get("/api/log")
 def api_log():
-    utils.ensure_csv(PROGRESS_LOG)
-    return send_file(PROGRESS_LOG, as_attachment=True, download_name=os.path.basename(PROGRESS_LOG))
+    return Response(
+        PROGRESS.iter_csv(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={os.path.basename(PROGRESS_LOG)}"},
+    )
 
 @app.get("/api/wp/export")
 def api_wp_export():
@@ -147,8 +292,17 @@ def api_wp_export():
         if not category_id:
             return jsonify({"error": "WP_CATEGORY_ID not configured"}), 500
 
+    live = request.args.get("live") == "1" or WP_MIRROR is None
     try:
-        csv_text = wp_client.export_posts_csv(category_id)
+        if live:
+            rows = wp_client.iter_posts_csv(category_id)
+        else:
+            # Only posts modified since the last export are fetched; the CSV is served from the mirror
+            stats = wp_client.sync_mirror(WP_MIRROR, category_id, full=request.args.get("full") == "1")
+            print(f"DEBUG /api/wp/export - Mirror sync: {stats}")
+            rows = wp_client.iter_posts_csv(category_id, pages=WP_MIRROR.iter_pages(category_id))
+        # Produce the header and the first page before committing to a 200 so auth/config errors still come back as JSON
+        first = list(itertools.islice(rows, 2))
     except Exception as e:
         print(f"ERROR in api_wp_export: {str(e)}")
         traceback.print_exc()
@@ -156,24 +310,73 @@ def api_wp_export():
 
     filename = f"wp_posts_category_{category_id}.csv"
     return Response(
-        csv_text,
+        itertools.chain(first, rows),
         mimetype="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
+@app.post("/api/wp/index/rebuild")
+def api_wp_index_rebuild():
+    index = post_indexmod.default_index()
+    if not index: return jsonify({"error": "WP_CATEGORY_ID not configured"}), 500
+    try:
+        n = index.rebuild()
+    except Exception as e:
+        print(f"ERROR in api_wp_index_rebuild: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"posts": n, "indexed": len(index.posts), "watermark": index.watermark})
+
 @app.get("/source/pdf")
 def source_pdf():
     path = request.args.get("path")
     if not path or not os.path.exists(path): return f"Not found: {path}", 404
-    return send_file(path, mimetype="application/pdf")
+    version = _file_version(path)
+    # conditional=True: Range requests get 206 partial content, matching ETag/If-Modified-Since get 304
+    resp = send_file(path, mimetype="application/pdf", conditional=True, etag=f"pdf-{version}")
+    return _source_cache_headers(resp, version)
+
+@app.get("/source/pdf/preview")
+def source_pdf_preview():
+    path = request.args.get("path")
+    if not PDF_PREVIEWS: return "Previews disabled", 404
+    if not path or not os.path.exists(path): return f"Not found: {path}", 404
+    try:
+        page = int(request.args.get("page", "1"))
+    except ValueError:
+        return "page must be an integer", 400
+    version = _file_version(path)
+    etag = f"preview-{version}-{page}-{extract.PDF_PREVIEW_DPI}"
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        try:
+            png = extract.pdf_preview_png(path, page)
+        except IndexError as e:
+            return f"No such page: {e}", 404
+        resp = Response(png, mimetype="image/png")
+    resp.set_etag(etag)
+    return _source_cache_headers(resp, version)
 
 @app.get("/source/docx_html")
 def source_docx_html():
     path = request.args.get("path")
     if not path or not os.path.exists(path): return f"Not found: {path}", 404
-    html = extract.docx_to_html(path)
-    doc = f"<!doctype html><meta charset='utf-8'><style>body{{font-family:serif;line-height:1.6;padding:16px;max-width:800px;margin:auto}}</style>{html}"
-    return doc
+    _, mtime_ns, size = extract.docx_signature(path)
+    etag = f"docx-{mtime_ns:x}-{size:x}"
+    last_modified = datetime.fromtimestamp(mtime_ns // 1_000_000_000, timezone.utc)
+    # Answer revalidations from the file's stat alone, before any DOCX parsing
+    if etag in request.if_none_match or (not request.if_none_match and request.if_modified_since
+                                         and last_modified <= request.if_modified_since):
+        resp = Response(status=304)
+    else:
+        html = extract.docx_to_html(path)
+        resp = Response(f"<!doctype html><meta charset='utf-8'><style>body{{font-family:serif;line-height:1.6;padding:16px;max-width:800px;margin:auto}}</style>{html}",
+                        mimetype="text/html")
+    resp.set_etag(etag)
+    resp.last_modified = last_modified
+    resp.cache_control.no_cache = True
+    return resp
 
 if __name__ == "__main__":
     app.run(debug=True)
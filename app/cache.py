@@ -0,0 +1,130 @@
+import os, json, hashlib, threading
+from typing import Callable, Optional
+
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "results")).strip()
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "512") or 0)
+PREVIEW_CACHE_DIR = os.getenv("PREVIEW_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "previews")).strip()
+PREVIEW_CACHE_MAX_MB = float(os.getenv("PREVIEW_CACHE_MAX_MB", "256") or 0)
+
+_digests = {}  # (path, size, mtime_ns) -> sha256 hex of the file content
+_digests_lock = threading.Lock()
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's content, memoized per (path, size, mtime) so unchanged files hash once."""
+    st = os.stat(path)
+    sig = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digests_lock:
+        if sig in _digests: return _digests[sig]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""): h.update(block)
+    digest = h.hexdigest()
+    with _digests_lock: _digests[sig] = digest
+    return digest
+
+class ResultCache:
+    """Content-addressed text cache on disk with size-based LRU eviction.
+
+    Entries are keyed by the source file's content hash plus the parameters that
+    produced them, so renames and copies still hit and any parameter change
+    misses. Files are written atomically and a hit touches the entry's mtime,
+    which is the LRU order used when the directory grows past max_bytes. Any
+    process pointed at the same directory (the app, batch scripts) shares it.
+    """
+
+    def __init__(self, root: str, max_bytes: int, ext: str = "txt", binary: bool = False):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ext = ext
+        self.binary = binary  # entries are bytes (e.g. rendered images) instead of text
+        self._size = None  # bytes on disk; scanned lazily on first write
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def key(self, kind: str, path: str, **params) -> str:
+        raw = json.dumps({"kind": kind, "file": file_digest(path), "params": params}, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str: return os.path.join(self.root, key[:2], f"{key}.{self.ext}")
+
+    def _open(self, p: str, mode: str):
+        return open(p, mode + "b") if self.binary else open(p, mode, encoding="utf-8")
+
+    def get(self, key: str):
+        p = self._path(key)
+        try:
+            with self._open(p, "r") as f: text = f.read()
+        except FileNotFoundError:
+            with self._lock: self.misses += 1
+            return None
+        try: os.utime(p)
+        except OSError: pass
+        with self._lock: self.hits += 1
+        return text
+
+    def put(self, key: str, text):
+        p = self._path(key)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        tmp = f"{p}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._open(tmp, "w") as f: f.write(text)
+        os.replace(tmp, p)
+        with self._lock:
+            if self._size is None: self._size = sum(size for _, size, _ in self._scan())
+            else: self._size += os.path.getsize(p)
+            if self._size > self.max_bytes: self._evict()
+
+    def _scan(self):
+        out = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(f".{self.ext}"): continue
+                fp = os.path.join(dirpath, name)
+                try: st = os.stat(fp)
+                except FileNotFoundError: continue
+                out.append((st.st_mtime, st.st_size, fp))
+        return out
+
+    def _evict(self):
+        # Drop least recently used entries until comfortably under the limit
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, fp in entries:
+            if total <= target: break
+            try: os.remove(fp)
+            except FileNotFoundError: pass
+            total -= size
+            self.evictions += 1
+        self._size = total
+
+    def cached(self, kind: str, path: str, compute: Callable[[], str], **params):
+        """Return the cached result for (file content, kind, params) or compute and store it."""
+        key = self.key(kind, path, **params)
+        text = self.get(key)
+        if text is None:
+            text = compute()
+            self.put(key, text)
+        return text
+
+    def stats(self):
+        with self._lock:
+            return {"dir": self.root, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "max_bytes": self.max_bytes, "size_bytes": self._size}
+
+_default = None
+
+def default_cache() -> Optional[ResultCache]:
+    """Process-wide cache configured by RESULT_CACHE_DIR / RESULT_CACHE_MAX_MB; None when disabled."""
+    global _default
+    if _default is None and RESULT_CACHE_DIR and RESULT_CACHE_MAX_MB > 0:
+        _default = ResultCache(RESULT_CACHE_DIR, int(RESULT_CACHE_MAX_MB * 1024 * 1024))
+    return _default
+
+_preview = None
+
+def preview_cache() -> Optional[ResultCache]:
+    """PNG page previews, configured by PREVIEW_CACHE_DIR / PREVIEW_CACHE_MAX_MB; None when disabled."""
+    global _preview
+    if _preview is None and PREVIEW_CACHE_DIR and PREVIEW_CACHE_MAX_MB > 0:
+        _preview = ResultCache(PREVIEW_CACHE_DIR, int(PREVIEW_CACHE_MAX_MB * 1024 * 1024), ext="png", binary=True)
+    return _preview
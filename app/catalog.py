@@ -0,0 +1,153 @@
+import os, json, time, bisect, threading
+from . import utils
+
+SNAPSHOT_VERSION = 1
+
+def _date_key(it): return it["date_parsed"]
+
+class Catalog:
+    """Date-sorted catalog of SOURCE_ROOT that refreshes incrementally.
+
+    Each year folder's mtime is recorded when it is scanned; refresh() stats the
+    year folders and rescans only the ones that were added or changed, then merges
+    the result into `items` and `index` in place so existing references stay valid.
+
+    With an index_path, the per-year scans are persisted as a JSON snapshot keyed
+    by folder mtime. The first refresh() loads it, so a cold start only rescans
+    the folders that changed since the snapshot was written.
+    """
+
+    def __init__(self, source_root: str, workers: int = 0, index_path: str = ""):
+        self.source_root = os.path.abspath(source_root) if source_root else ""
+        self.workers = workers
+        self.index_path = index_path
+        self._snapshot_loaded = False
+        self.items = []          # sorted by date_parsed
+        self.index = {}          # basename -> item (same dicts as in items)
+        self.by_year = {}        # year_folder -> {basename: rec} as last scanned
+        self.dir_mtimes = {}     # year_folder -> st_mtime_ns at last scan
+        self.last_refresh = 0.0
+        self.version = 0         # bumped whenever items are added or removed
+        self._lock = threading.Lock()
+
+    def __len__(self): return len(self.items)
+
+    def _current_year_dirs(self):
+        if not self.source_root or not os.path.isdir(self.source_root): return []
+        out = []
+        for entry, path in utils.list_year_dirs(self.source_root):
+            try: out.append((entry, path, os.stat(path).st_mtime_ns))
+            except FileNotFoundError: continue
+        return out
+
+    def _compose(self):
+        # Copies so merging paths across year folders never mutates the cached per-year scans
+        merged = {}
+        for year in sorted(self.by_year):
+            utils.merge_year_recs(merged, {k: dict(v) for k, v in self.by_year[year].items()})
+        return merged
+
+    def load_snapshot(self):
+        """Seed by_year/dir_mtimes from the on-disk snapshot. Returns the number of years loaded."""
+        self._snapshot_loaded = True
+        if not self.index_path or not os.path.exists(self.index_path): return 0
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                snap = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"DEBUG catalog - Ignoring unreadable snapshot {self.index_path}: {e}")
+            return 0
+        if snap.get("version") != SNAPSHOT_VERSION or snap.get("source_root") != self.source_root: return 0
+        for year, entry in snap.get("years", {}).items():
+            year_dir = os.path.join(self.source_root, year)
+            recs = {}
+            for stem, iso, pdf_name, docx_name in entry["r"]:
+                recs[stem] = {"year_folder": year, "basename": stem,
+                              "pdf_path": os.path.join(year_dir, pdf_name) if pdf_name else None,
+                              "docx_path": os.path.join(year_dir, docx_name) if docx_name else None,
+                              "date_parsed": iso}
+            self.by_year[year] = recs
+            self.dir_mtimes[year] = entry["m"]
+        # Build items/index from the snapshot; refresh() then only has to revalidate mtimes
+        self._merge(self._compose(), {"added": [], "removed": [], "updated": []})
+        return len(self.by_year)
+
+    def save_snapshot(self):
+        if not self.index_path: return
+        years = {}
+        for year, recs in self.by_year.items():
+            years[year] = {"m": self.dir_mtimes[year], "r": [
+                [r["basename"], r["date_parsed"],
+                 os.path.basename(r["pdf_path"]) if r["pdf_path"] else "",
+                 os.path.basename(r["docx_path"]) if r["docx_path"] else ""]
+                for r in recs.values()]}
+        tmp = f"{self.index_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "source_root": self.source_root, "years": years},
+                      f, separators=(",", ":"))
+        os.replace(tmp, self.index_path)
+
+    def ensure_loaded(self):
+        """First-use load: snapshot plus a revalidating refresh()."""
+        if not self.last_refresh: self.refresh()
+
+    def refresh(self):
+        """Rescan changed year folders and merge them in. Returns the delta."""
+        with self._lock:
+            t0 = time.perf_counter()
+            if not self._snapshot_loaded: self.load_snapshot()
+            current = self._current_year_dirs()
+            present = {entry for entry, _, _ in current}
+            gone_years = [y for y in self.by_year if y not in present]
+            stale = [(entry, path, mtime) for entry, path, mtime in current
+                     if self.dir_mtimes.get(entry) != mtime]
+            self.last_refresh = time.time()
+            delta = {"rescanned": [e for e, _, _ in stale], "removed_years": gone_years,
+                     "added": [], "removed": [], "updated": []}
+            if not stale and not gone_years:
+                delta["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+                return delta
+
+            for y in gone_years:
+                self.by_year.pop(y, None); self.dir_mtimes.pop(y, None)
+            scanned = utils.scan_year_dirs([(e, p) for e, p, _ in stale], self.workers)
+            for (entry, _, mtime), recs in zip(stale, scanned):
+                self.by_year[entry] = recs
+                self.dir_mtimes[entry] = mtime
+            self._merge(self._compose(), delta)
+            try: self.save_snapshot()
+            except OSError as e: print(f"DEBUG catalog - Could not write snapshot {self.index_path}: {e}")
+            delta["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            return delta
+
+    def _merge(self, merged: dict, delta: dict):
+        removed = [name for name in self.index if name not in merged]
+        if removed:
+            gone = set(removed)
+            self.items[:] = [it for it in self.items if it["basename"] not in gone]
+            for name in removed: del self.index[name]
+        added = []
+        for name, rec in merged.items():
+            cur = self.index.get(name)
+            if cur is None:
+                added.append(rec)
+                self.index[name] = rec
+            elif cur != rec:
+                cur.update(rec)
+                delta["updated"].append(name)
+        # A handful of new scans are inserted in place; a bulk load is cheaper as one sort
+        if len(added) > 64:
+            self.items.extend(added)
+            self.items.sort(key=_date_key)
+        else:
+            for rec in added: bisect.insort(self.items, rec, key=_date_key)
+        delta["added"] = [rec["basename"] for rec in added]
+        delta["removed"] = removed
+        if added or removed: self.version += 1
+
+    def maybe_refresh(self, min_interval: float):
+        """refresh() at most once per min_interval seconds; None when skipped."""
+        if time.time() - self.last_refresh < min_interval: return None
+        return self.refresh()
+
+    def get(self, basename): return self.index.get(basename)
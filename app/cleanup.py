@@ -2,17 +2,113 @@ import re, unicodedata
 LIGATURES = {"\ufb01":"fi","\ufb02":"fl"}
 GUILLEMETS = {"«":"\"","»":"\"","‹":"'", "›":"'"}
 
-def fix_hyphenation(text: str) -> str:
-    return re.sub(r'(\w+)-\n(\w+)', r'\1\2', text)
-
-def normalize_unicode(text: str) -> str:
-    text = unicodedata.normalize("NFC", text)
-    for k,v in LIGATURES.items(): text = text.replace(k,v)
-    for k,v in GUILLEMETS.items(): text = text.replace(k,v)
-    text = text.replace("^^", "^")
-    text = re.sub(r'[ \t]+', ' ', text)
-    text = text.replace('\r\n','\n').replace('\r','\n')
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    return text
-
-def cleanup_text(text: str) -> str: return normalize_unicode(fix_hyphenation(text))
+class CharMap:
+    """Single-character substitutions; consecutive CharMaps are fused into one table."""
+    def __init__(self, mapping, name="char_map"):
+        self.mapping, self.name = dict(mapping), name
+
+class Replace:
+    def __init__(self, old, new, name=None):
+        self.old, self.new, self.name = old, new, name or f"replace {old!r}"
+    def __call__(self, text): return text.replace(self.old, self.new)
+
+class Regex:
+    """re.sub with a pattern compiled once. Patterns that start with a literal are scanned much faster by re."""
+    def __init__(self, pattern, repl, flags=0, name=None):
+        self.pattern, self.repl, self.name = re.compile(pattern, flags), repl, name or pattern
+    def __call__(self, text): return self.pattern.sub(self.repl, text)
+
+class Normalize:
+    def __init__(self, form="NFC"):
+        self.form, self.name = form, form
+    def __call__(self, text):
+        return text if text.isascii() else unicodedata.normalize(self.form, text)
+
+def _is_word(ch): return ch.isalnum() or ch == "_"
+
+class Dehyphenate:
+    """Joins words split as "word-\\n word" -- the same result as re.sub(r'(\\w+)-\\n(\\w+)', r'\\1\\2', text).
+
+    Only the "-\\n" occurrences are visited (str.find) instead of trying the
+    regex at every word character. Like the regex, a word that was itself the
+    tail of a join is not joined again ("a-\\nb-\\nc" -> "ab-\\nc").
+    """
+    name = "hyphenation"
+    def __call__(self, text):
+        i = text.find("-\n")
+        if i < 0: return text
+        parts, start, tail_end, n = [], 0, -1, len(text)
+        while i >= 0:
+            j = i + 2
+            if i > 0 and j < n and i != tail_end and _is_word(text[i - 1]) and _is_word(text[j]):
+                parts.append(text[start:i])
+                start = j
+                while j < n and _is_word(text[j]): j += 1
+                tail_end = j
+            i = text.find("-\n", j)
+        parts.append(text[start:])
+        return "".join(parts)
+
+def _compose(table, mapping):
+    """translate table equivalent to applying `table` then `mapping`."""
+    out = {k: (None if v is None else "".join(mapping.get(ch, ch) or "" for ch in v)) for k, v in table.items()}
+    for ch, v in mapping.items(): out.setdefault(ord(ch), v)
+    return out
+
+class _Table:
+    """A fused CharMap. Small tables whose outputs never feed another key run as a chain
+    of str.replace, which CPython does far faster than str.translate with a dict."""
+    def __init__(self, table):
+        self.table = table
+        keys = {chr(k) for k in table}
+        self.chain = None
+        if len(table) <= 32 and not any(ch in keys for v in table.values() if v for ch in v):
+            self.chain = [(chr(k), v or "") for k, v in table.items()]
+    def __call__(self, text):
+        if self.chain is None: return text.translate(self.table)
+        for old, new in self.chain: text = text.replace(old, new)
+        return text
+
+class CleanupEngine:
+    """Runs an ordered list of rules, compiled once.
+
+    Rules are CharMap, Replace, Regex, Normalize, Dehyphenate or any callable
+    text -> text. Consecutive CharMaps are fused into a single table step, so
+    adding character fixes doesn't add a pass per mapping.
+    """
+    def __init__(self, rules):
+        self.rules, steps = list(rules), []
+        for rule in self.rules:
+            if isinstance(rule, CharMap):
+                if steps and isinstance(steps[-1], dict): steps[-1] = _compose(steps[-1], rule.mapping)
+                else: steps.append({ord(k): v for k, v in rule.mapping.items()})
+            else:
+                steps.append(rule)
+        self.steps = [_Table(s) if isinstance(s, dict) else s for s in steps]
+
+    def __call__(self, text: str) -> str:
+        for step in self.steps: text = step(text)
+        return text
+
+HYPHENATION = Dehyphenate()
+
+UNICODE_RULES = [
+    Normalize("NFC"),
+    CharMap(LIGATURES, "ligatures"),
+    CharMap(GUILLEMETS, "guillemets"),
+    CharMap({"\t": " "}, "tabs"),  # with the next-but-one rule, same as collapsing [ \t]+
+    Replace("^^", "^"),
+    Regex(r"  +", " ", name="spaces"),
+    Replace("\r\n", "\n"),
+    Replace("\r", "\n"),
+    Regex(r"\n\n\n+", "\n\n", name="blank_lines"),
+]
+
+_normalize = CleanupEngine(UNICODE_RULES)
+_cleanup = CleanupEngine([HYPHENATION] + UNICODE_RULES)
+
+def fix_hyphenation(text: str) -> str: return HYPHENATION(text)
+
+def normalize_unicode(text: str) -> str: return _normalize(text)
+
+def cleanup_text(text: str) -> str: return _cleanup(text)
@@ -1,17 +1,77 @@
-import fitz, docx, mammoth
+import os, threading
+from collections import OrderedDict
+import fitz, mammoth
+from mammoth.raw_text import extract_raw_text_from_element
+from . import cache as cachemod
 
-def extract_pdf_text(pdf_path: str) -> str:
-    parts = []
+DOCX_CACHE_SIZE = int(os.getenv("DOCX_CACHE_SIZE", "64") or 0)  # Rendered DOCX files kept in memory; 0 disables
+PDF_PREVIEW_DPI = int(os.getenv("PDF_PREVIEW_DPI", "48") or 48)  # Resolution of the quick page previews
+
+def extract_pdf_text(pdf_path: str, use_cache: bool = True) -> str:
+    cache = cachemod.default_cache() if use_cache else None
+    if cache is None: return _extract_pdf_text(pdf_path)
+    return cache.cached("pdf_text", pdf_path, lambda: _extract_pdf_text(pdf_path), pymupdf=fitz.VersionBind)
+
+def extract_pdf_pages(pdf_path: str):
+    """Text layer of each page, in page order (empty string for pages without one)."""
     with fitz.open(pdf_path) as doc:
-        for page in doc:
-            t = page.get_text("text")
-            if t: parts.append(t)
+        return [page.get_text("text") or "" for page in doc]
+
+def pdf_preview_png(pdf_path: str, page_no: int = 1, dpi: int = PDF_PREVIEW_DPI, use_cache: bool = True) -> bytes:
+    """Low-resolution grayscale PNG of a 1-based page, cached on disk; IndexError for a page out of range."""
+    def render():
+        with fitz.open(pdf_path) as doc:
+            if not 1 <= page_no <= doc.page_count: raise IndexError(f"page {page_no} of {doc.page_count}")
+            return doc[page_no - 1].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).tobytes("png")
+    cache = cachemod.preview_cache() if use_cache else None
+    if cache is None: return render()
+    return cache.cached("pdf_preview", pdf_path, render, page=page_no, dpi=dpi)
+
+def _extract_pdf_text(pdf_path: str) -> str:
+    parts = [t for t in extract_pdf_pages(pdf_path) if t]
     return "\n".join(parts).strip()
 
-def extract_docx_text(docx_path: str) -> str:
-    d = docx.Document(docx_path)
-    return "\n".join(p.text for p in d.paragraphs).strip()
+_docx_renders = OrderedDict()  # (path, mtime_ns, size) -> {"html", "text"}
+_docx_lock = threading.Lock()
 
-def docx_to_html(docx_path: str) -> str:
+def docx_signature(docx_path: str):
+    """(abspath, mtime_ns, size): what a cached render (and the /source/docx_html ETag) is keyed on."""
+    st = os.stat(docx_path)
+    return os.path.abspath(docx_path), st.st_mtime_ns, st.st_size
+
+def render_docx(docx_path: str) -> dict:
+    """HTML and plain text of a DOCX from one mammoth parse, LRU-cached by path, mtime and size."""
+    sig = docx_signature(docx_path)
+    with _docx_lock:
+        hit = _docx_renders.get(sig)
+        if hit is not None:
+            _docx_renders.move_to_end(sig)
+            return hit
+    texts = []
+    def keep_text(document):
+        texts.append(extract_raw_text_from_element(document))
+        return document
     with open(docx_path, "rb") as f:
-        return mammoth.convert_to_html(f).value
+        html = mammoth.convert_to_html(f, transform_document=keep_text).value
+    # mammoth ends every paragraph with a blank line; keep one line per paragraph as before
+    rendered = {"html": html, "text": "".join(texts).replace("\n\n", "\n").strip()}
+    if DOCX_CACHE_SIZE > 0:
+        with _docx_lock:
+            _docx_renders[sig] = rendered
+            while len(_docx_renders) > DOCX_CACHE_SIZE: _docx_renders.popitem(last=False)
+    return rendered
+
+def extract_docx_text(docx_path: str) -> str: return render_docx(docx_path)["text"]
+
+def docx_to_html(docx_path: str) -> str: return render_docx(docx_path)["html"]
+
+def extract_item_text(item: dict, pdf_loader=None) -> str:
+    """Initial editor text for a catalog item: the PDF text (extract_pdf_text or pdf_loader), else the DOCX text."""
+    text = ""
+    if item.get("pdf_path"):
+        try: text = (pdf_loader or extract_pdf_text)(item["pdf_path"])
+        except Exception: text = ""
+    if not text and item.get("docx_path"):
+        try: text = extract_docx_text(item["docx_path"])
+        except Exception: text = text or ""
+    return text
@@ -0,0 +1,59 @@
+import time, uuid, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+TERMINAL = ("done","error")
+
+class JobQueue:
+    """Background executor for slow per-item work (OCR) with pollable job state.
+
+    submit() returns a job id immediately; the job dict is updated as the
+    worker reports progress, and wait_for_change() lets a streaming endpoint
+    block until the next update instead of polling. Only the most recent
+    `keep` jobs are retained.
+    """
+
+    def __init__(self, workers: int = 1, keep: int = 100):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="jobs")
+        self._jobs = OrderedDict()
+        self._cond = threading.Condition()
+        self.keep = keep
+
+    def submit(self, fn, **meta):
+        """Run fn(progress) in the background; fn's return value becomes job["result"]."""
+        job_id = uuid.uuid4().hex[:12]
+        job = {"id": job_id, "status": "queued", "done": 0, "total": None, "result": None,
+               "error": None, "created": time.time(), "finished": None, "rev": 0, **meta}
+        with self._cond:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.keep: self._jobs.popitem(last=False)
+        self._pool.submit(self._run, job, fn)
+        return job_id
+
+    def _update(self, job, **fields):
+        with self._cond:
+            job.update(fields)
+            job["rev"] += 1
+            self._cond.notify_all()
+
+    def _run(self, job, fn):
+        self._update(job, status="running", started=time.time())
+        try:
+            result = fn(lambda done, total: self._update(job, done=done, total=total))
+        except Exception as e:
+            print(f"ERROR in job {job['id']}: {e}")
+            self._update(job, status="error", error=str(e), finished=time.time())
+            return
+        self._update(job, status="done", result=result, finished=time.time())
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait_for_change(self, job_id, rev: int, timeout: float = 15.0):
+        """Block until the job's rev moves past `rev` (or timeout); returns a snapshot or None if unknown."""
+        with self._cond:
+            self._cond.wait_for(lambda: job_id not in self._jobs or self._jobs[job_id]["rev"] != rev, timeout=timeout)
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
@@ -1,17 +1,91 @@
-from typing import List
-from pdf2image import convert_from_path
+import os, re, json, time, threading, multiprocessing
+from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from pdf2image import convert_from_path, pdfinfo_from_path
 import pytesseract
+from . import cache as cachemod, extract, ocr_rules
 
-def ocr_pdf_to_text(pdf_path: str) -> str:
-    images = convert_from_path(pdf_path, dpi=300)
-    parts: List[str] = []
-    for img in images:
-        t = pytesseract.image_to_string(img)
-        if t: parts.append(t)
-    
-    # Join all pages
-    raw_text = "\n".join(parts).strip()
-    
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "600"))  # seconds per document; 0 = no limit
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_PSM = os.getenv("OCR_PSM", "").strip()  # Tesseract page segmentation mode; blank = Tesseract default
+# Text-layer quality gate for the hybrid extractor; pages failing any check are OCR'd
+OCR_MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", "80"))
+OCR_MIN_WORD_RATIO = float(os.getenv("OCR_MIN_WORD_RATIO", "0.7"))
+OCR_MIN_COMMON_RATIO = float(os.getenv("OCR_MIN_COMMON_RATIO", "0.15"))
+OCR_MAX_NOISE_RATIO = float(os.getenv("OCR_MAX_NOISE_RATIO", "0.05"))
+
+# The most frequent English words: running prose is roughly 40% these, OCR garbage almost none
+COMMON_WORDS = frozenset("""
+the of and to a in is it that for was on as with he be by at this are his not but from have or they
+an had which you one were her all she there would their we him been has when who will more no if out
+so said what up its about into than them can only other new some could time these two may then do
+first any my now such like our over man me even most made after also did many before must through
+back years where much your way well down should because each just those people how too little state
+good very make world still own see men work long get here between both life being under never day
+same another know while last might us great old year off come since against go came right used take
+three states himself few house use during without again place american around however home small
+found thought went say part once general high upon school every don does got united left number
+course war until always away something fact though water less public put think almost hand enough
+far took head yet government system better set told nothing night end why called didn find look
+asked later knew point next program city business give group toward young let room president side
+social given present several order national possible rather second face per among form important
+often things looked early white case john become large big need four within felt children along
+saw best church ever least power development light thing seemed family interest want members mind
+country area others although turned done open god service certain kind problem began different door
+thus help sense means whole matter perhaps itself york times law human line above name example
+action company hands local show whether five history gave today either act feet across taken past
+quite anything having seen death experience body word half really week free car field morning
+""".split())
+
+_WORD_RE = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_VOWEL_RE = re.compile(r"[aeiouyAEIOUY]")
+_REPEAT_RE = re.compile(r"(.)\1\1")
+_CLEAN_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+                         ".,;:'\"!?()[]-/&$%*#@\u2018\u2019\u201c\u201d\u2013\u2014\u2026")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    # One long-lived pool sized to OCR_WORKERS, shared by every caller (requests, jobs, prefetch), so one
+    # call can't cancel another's pages; it is only replaced once broken (see _discard_pool). Spawning
+    # Tesseract workers per request would cost more than small PDFs take. Workers come from a fork server
+    # (spawn where there is none) rather than forking this process and its prefetch/job/HTTP threads.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool = ProcessPoolExecutor(max_workers=max(1, OCR_WORKERS), mp_context=ctx)
+        return _pool
+
+def _discard_pool(pool):
+    # A worker died (e.g. OOM-killed mid-render) and the pool is unusable; the next call builds a new one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            print("DEBUG ocr - OCR worker pool broke; starting a new one")
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _tesseract_config(psm: str) -> str: return f"--psm {psm}" if psm else ""
+
+def _ocr_page(pdf_path: str, page_no: int, dpi: int, lang: str = OCR_LANG, psm: str = OCR_PSM) -> str:
+    """Rasterize and recognize a single 1-based page (runs in a worker process for parallel OCR).
+
+    Only this page's bitmap is ever in memory, rendered in grayscale (a third
+    of the RGB size; Tesseract works on gray anyway) and closed once recognized.
+    """
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_no, last_page=page_no, grayscale=True)
+    try:
+        return pytesseract.image_to_string(images[0], lang=lang, config=_tesseract_config(psm)) if images else ""
+    finally:
+        for img in images: img.close()
+
+def collapse_paragraphs(raw_text: str) -> str:
     # Collapse paragraphs: split by double newlines (paragraph breaks)
     # then replace single newlines within each paragraph with spaces
     paragraphs = raw_text.split('\n\n')
@@ -21,5 +95,163 @@ def ocr_pdf_to_text(pdf_path: str) -> str:
         collapsed_para = para.replace('\n', ' ').strip()
         if collapsed_para:
             collapsed.append(collapsed_para)
-    
     return '\n\n'.join(collapsed)
+
+def _ocr_pages_parallel(pdf_path: str, page_nos: List[int], workers: int, dpi: int, timeout: float,
+                        progress: Optional[Callable[[int, int], None]]) -> Dict[int, str]:
+    """This call's concurrency is the number of pages it keeps submitted (at most `workers`), not the pool size."""
+    pool = _get_pool()
+    try:
+        return _run_pages(pool, pdf_path, page_nos, workers, dpi, timeout, progress)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
+def _run_pages(pool, pdf_path: str, page_nos: List[int], workers: int, dpi: int, timeout: float,
+               progress: Optional[Callable[[int, int], None]]) -> Dict[int, str]:
+    todo = iter(page_nos)
+    futures = {}
+    def submit_next():
+        n = next(todo, None)
+        if n is not None: futures[pool.submit(_ocr_page, pdf_path, n, dpi, OCR_LANG, OCR_PSM)] = n
+    for _ in range(workers): submit_next()
+    pages: Dict[int, str] = {}
+    total = len(page_nos)
+    deadline = time.monotonic() + timeout if timeout else None
+    pending = set(futures)
+    while pending:
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            for f in pending: f.cancel()
+            raise TimeoutError(f"OCR of {os.path.basename(pdf_path)} exceeded {timeout:g}s "
+                               f"({len(pages)}/{total} pages done)")
+        finished, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for f in finished:
+            pages[futures.pop(f)] = f.result()
+            if progress: progress(len(pages), total)
+            submit_next()
+        pending = set(futures)
+    return pages
+
+def _ocr_pages(pdf_path: str, page_nos: List[int], workers: Optional[int], timeout: Optional[float],
+               progress: Optional[Callable[[int, int], None]]) -> Dict[int, str]:
+    """OCR the given 1-based pages; returns {page_no: raw text}."""
+    workers = OCR_WORKERS if workers is None else workers
+    timeout = OCR_TIMEOUT if timeout is None else timeout
+    if workers > 1 and len(page_nos) > 1:
+        return _ocr_pages_parallel(pdf_path, page_nos, min(workers, OCR_WORKERS, len(page_nos)), OCR_DPI, timeout, progress)
+    # Serial path streams one page at a time, so peak memory is a single page bitmap
+    deadline = time.monotonic() + timeout if timeout else None
+    pages: Dict[int, str] = {}
+    for i, n in enumerate(page_nos, 1):
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"OCR of {os.path.basename(pdf_path)} exceeded {timeout:g}s ({i - 1}/{len(page_nos)} pages done)")
+        pages[n] = _ocr_page(pdf_path, n, OCR_DPI, OCR_LANG, OCR_PSM)
+        if progress: progress(i, len(page_nos))
+    return pages
+
+def ocr_pdf_to_text(pdf_path: str, workers: Optional[int] = None, timeout: Optional[float] = None,
+                    progress: Optional[Callable[[int, int], None]] = None, use_cache: bool = True,
+                    correct: bool = True) -> str:
+    """OCR every page and collapse the result into paragraphs.
+
+    Pages are rasterized one at a time, so peak memory is one page bitmap per
+    worker. With workers > 1 they are rendered and recognized in a process
+    pool and reassembled in page order. timeout (seconds) bounds the whole
+    document and raises TimeoutError; progress(done_pages, total_pages) is
+    called per page. Results are cached by file content and OCR parameters;
+    the OCR_RULES post-correction (correct=True) runs on the cached text, so
+    editing the rules never forces a re-OCR.
+    """
+    cache = cachemod.default_cache() if use_cache else None
+    if cache is None: text = _ocr_pdf(pdf_path, workers, timeout, progress)
+    else: text = cache.cached("ocr", pdf_path, lambda: _ocr_pdf(pdf_path, workers, timeout, progress),
+                              dpi=OCR_DPI, lang=OCR_LANG, psm=OCR_PSM)
+    return ocr_rules.correct(text) if correct else text
+
+def _ocr_pdf(pdf_path: str, workers: Optional[int], timeout: Optional[float],
+             progress: Optional[Callable[[int, int], None]]) -> str:
+    n_pages = int(pdfinfo_from_path(pdf_path).get("Pages", 0) or 0)
+    pages = _ocr_pages(pdf_path, list(range(1, n_pages + 1)), workers, timeout, progress)
+    parts: List[str] = [pages[n] for n in sorted(pages) if pages[n]]
+
+    # Join all pages
+    raw_text = "\n".join(parts).strip()
+    return collapse_paragraphs(raw_text)
+
+def score_page_text(text: str) -> Dict[str, float]:
+    """Quality signals for a page's text layer.
+
+    chars: non-whitespace characters; word_ratio: share of alphabetic tokens that
+    look like words (have a vowel, no tripled letters, sane length); common_ratio:
+    share of tokens that are frequent English words; noise_ratio: share of
+    characters outside letters, digits and ordinary punctuation.
+    """
+    compact = "".join(text.split())
+    chars = len(compact)
+    words = _WORD_RE.findall(text)
+    if not chars or not words:
+        return {"chars": chars, "word_ratio": 0.0, "common_ratio": 0.0, "noise_ratio": 1.0 if chars else 0.0}
+    plausible = sum(1 for w in words if len(w) <= 20 and _VOWEL_RE.search(w) and not _REPEAT_RE.search(w))
+    common = sum(1 for w in words if w.lower() in COMMON_WORDS)
+    noise = sum(1 for c in compact if c not in _CLEAN_CHARS)
+    return {"chars": chars, "word_ratio": plausible / len(words),
+            "common_ratio": common / len(words), "noise_ratio": noise / chars}
+
+def page_text_ok(score: Dict[str, float]) -> bool:
+    return (score["chars"] >= OCR_MIN_PAGE_CHARS and score["word_ratio"] >= OCR_MIN_WORD_RATIO
+            and score["common_ratio"] >= OCR_MIN_COMMON_RATIO and score["noise_ratio"] <= OCR_MAX_NOISE_RATIO)
+
+def ocr_pdf_hybrid(pdf_path: str, workers: Optional[int] = None, timeout: Optional[float] = None,
+                   progress: Optional[Callable[[int, int], None]] = None, use_cache: bool = True,
+                   correct: bool = True, on_error: Optional[Callable[[Exception], None]] = None) -> str:
+    """PDF text that keeps good text-layer pages and OCRs only the pages that fail page_text_ok().
+
+    correct=True runs the OCR_RULES post-correction on the OCR'd pages only;
+    clean text-layer pages are returned as extracted. See hybrid_pages() for on_error.
+    """
+    return join_pages(hybrid_pages(pdf_path, workers, timeout, progress, use_cache, on_error), correct)
+
+def hybrid_pages(pdf_path: str, workers: Optional[int] = None, timeout: Optional[float] = None,
+                 progress: Optional[Callable[[int, int], None]] = None, use_cache: bool = True,
+                 on_error: Optional[Callable[[Exception], None]] = None) -> List[Tuple[str, bool]]:
+    """Per-page hybrid text as (text, ocr_used) pairs; ocr_used is True only where OCR replaced the text layer.
+
+    If OCR fails (Tesseract or poppler missing, timeout, a broken worker pool)
+    the weak pages keep their text layer, on_error(exc) is called (default: a
+    debug line) and the result is not cached, so a later call retries OCR.
+    """
+    cache = cachemod.default_cache() if use_cache else None
+    key = cache.key("hybrid_pages", pdf_path, dpi=OCR_DPI, lang=OCR_LANG, psm=OCR_PSM, min_chars=OCR_MIN_PAGE_CHARS,
+                    min_word_ratio=OCR_MIN_WORD_RATIO, min_common_ratio=OCR_MIN_COMMON_RATIO,
+                    max_noise_ratio=OCR_MAX_NOISE_RATIO) if cache else None
+    raw = cache.get(key) if cache else None
+    if raw is not None: return [(t, bool(ocred)) for t, ocred in json.loads(raw)]
+    pages, error = _ocr_pdf_hybrid(pdf_path, workers, timeout, progress)
+    if error is not None:
+        if on_error: on_error(error)
+        else: print(f"DEBUG ocr - {os.path.basename(pdf_path)}: OCR failed, keeping the text layer: {error!r}")
+    elif cache:
+        cache.put(key, json.dumps(pages))
+    return pages
+
+def join_pages(pages: List[Tuple[str, bool]], correct: bool = False) -> str:
+    """hybrid_pages() output as one text; correct=True applies OCR_RULES to the OCR'd pages."""
+    parts = (ocr_rules.correct(t) if correct and ocred else t for t, ocred in pages)
+    return "\n".join(t for t in parts if t).strip()
+
+def _ocr_pdf_hybrid(pdf_path: str, workers: Optional[int], timeout: Optional[float],
+                    progress: Optional[Callable[[int, int], None]]) -> Tuple[List[Tuple[str, bool]], Optional[Exception]]:
+    pages = [(t, False) for t in extract.extract_pdf_pages(pdf_path)]
+    bad = [n for n, (t, _) in enumerate(pages, 1) if not page_text_ok(score_page_text(t))]
+    if not bad: return pages, None
+    print(f"DEBUG ocr - {os.path.basename(pdf_path)}: OCR for pages {bad} of {len(pages)}")
+    try:
+        ocred = _ocr_pages(pdf_path, bad, workers, timeout, progress)
+    except Exception as e:
+        # A failed OCR never costs the text already extracted
+        return pages, e
+    for n, t in ocred.items():
+        # Keep the text layer when OCR finds nothing better on that page
+        if t.strip(): pages[n - 1] = (collapse_paragraphs(t.strip()), True)
+    return pages, None
@@ -0,0 +1,142 @@
+import os, re, json, time, threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# JSON list of post-correction rules applied to OCR output; blank disables them
+OCR_RULES = os.getenv("OCR_RULES", os.path.join(os.path.dirname(os.path.dirname(__file__)), "ocr_rules.json")).strip()
+
+_FLAGS = {"IGNORECASE": re.I, "MULTILINE": re.M, "DOTALL": re.S}
+
+def _flags(names) -> int:
+    flags = 0
+    for n in ([names] if isinstance(names, str) else names or []): flags |= _FLAGS[n.upper()]
+    return flags
+
+def _match_case(found: str, fixed: str) -> str:
+    if found.isupper() and len(found) > 1: return fixed.upper()
+    if found[:1].isupper(): return fixed[:1].upper() + fixed[1:]
+    return fixed
+
+class Rule:
+    """One configured correction. apply(paragraph) -> (paragraph or None to drop it, hits).
+
+    Types:
+      regex   {"pattern", "repl", "flags"}    re.subn over the paragraph
+      replace {"old", "new"}                  literal substitution
+      words   {"map": {"tbe": "the"}}         whole-word fixes, case-insensitive, keeping the found capitalization
+      drop    {"pattern", "flags"}            drops paragraphs the pattern fully matches (running headers, folios)
+    """
+
+    def __init__(self, spec: dict):
+        self.type = spec.get("type", "regex")
+        self.name = spec.get("name") or f"{self.type}:{spec.get('pattern') or spec.get('old') or ''}"
+        if self.type in ("regex", "drop"):
+            self.pattern = re.compile(spec["pattern"], _flags(spec.get("flags")))
+            self.repl = spec.get("repl", "")
+        elif self.type == "replace":
+            self.old, self.new = spec["old"], spec.get("new", "")
+        elif self.type == "words":
+            self.map = {k.lower(): v for k, v in spec["map"].items()}
+            alternation = "|".join(re.escape(k) for k in sorted(self.map, key=len, reverse=True))
+            self.pattern = re.compile(rf"\b(?:{alternation})\b", re.I)
+            self.repl = lambda m: _match_case(m.group(), self.map[m.group().lower()])
+        else:
+            raise ValueError(f"Unknown OCR rule type {self.type!r} in rule {self.name!r}")
+
+    def apply(self, para: str):
+        if self.type == "drop":
+            return (None, 1) if self.pattern.fullmatch(para) else (para, 0)
+        if self.type == "replace":
+            hits = para.count(self.old)
+            return (para.replace(self.old, self.new) if hits else para), hits
+        return self.pattern.subn(self.repl, para)
+
+class RuleSet:
+    """Ordered post-correction rules run one paragraph at a time, with per-rule hit counts and time.
+
+    correct_paragraphs() is a generator, so long documents (or a whole batch run
+    fed through it) are corrected as they stream; stats() shows which rules
+    fire and which are slow.
+    """
+
+    def __init__(self, rules: List[Rule], source: str = ""):
+        self.rules = rules
+        self.source = source
+        self._lock = threading.Lock()
+        self._stats = {r.name: {"type": r.type, "hits": 0, "ms": 0.0} for r in rules}
+        self.documents = self.paragraphs = self.dropped = 0
+
+    @classmethod
+    def load(cls, path: str) -> "RuleSet":
+        with open(path, "r", encoding="utf-8") as f: specs = json.load(f)
+        return cls([Rule(s) for s in specs if not s.get("disabled")], source=path)
+
+    def correct_paragraphs(self, paragraphs: Iterable[str]) -> Iterator[str]:
+        hits = [0] * len(self.rules)
+        spent = [0.0] * len(self.rules)
+        seen = dropped = 0
+        try:
+            for para in paragraphs:
+                seen += 1
+                for i, rule in enumerate(self.rules):
+                    t0 = time.perf_counter()
+                    para, n = rule.apply(para)
+                    spent[i] += time.perf_counter() - t0
+                    hits[i] += n
+                    if para is None: break
+                if para is None or not para.strip():
+                    dropped += 1
+                    continue
+                yield para
+        finally:
+            with self._lock:
+                self.documents += 1
+                self.paragraphs += seen
+                self.dropped += dropped
+                for i, rule in enumerate(self.rules):
+                    s = self._stats[rule.name]
+                    s["hits"] += hits[i]
+                    s["ms"] += spent[i] * 1000
+
+    def correct(self, text: str) -> str:
+        return "\n\n".join(self.correct_paragraphs(iter_paragraphs(text)))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rules = [{"name": name, **s, "ms": round(s["ms"], 2)} for name, s in self._stats.items()]
+            return {"source": self.source, "documents": self.documents, "paragraphs": self.paragraphs,
+                    "dropped": self.dropped, "rules": sorted(rules, key=lambda r: -r["ms"])}
+
+def iter_paragraphs(text: str) -> Iterator[str]:
+    """Paragraphs of text (split on blank lines) without building the whole list."""
+    start = 0
+    while True:
+        end = text.find("\n\n", start)
+        if end < 0:
+            if start < len(text): yield text[start:]
+            return
+        if end > start: yield text[start:end]
+        start = end + 2
+
+_default = None  # (path, mtime_ns, RuleSet)
+_default_lock = threading.Lock()
+
+def default_rules() -> Optional[RuleSet]:
+    """RuleSet from OCR_RULES, reloaded when the file changes; None when unset or missing."""
+    global _default
+    if not OCR_RULES: return None
+    try: mtime = os.stat(OCR_RULES).st_mtime_ns
+    except OSError: return None
+    with _default_lock:
+        if _default is None or _default[:2] != (OCR_RULES, mtime):
+            try:
+                _default = (OCR_RULES, mtime, RuleSet.load(OCR_RULES))
+                print(f"DEBUG ocr_rules - Loaded {len(_default[2].rules)} rules from {OCR_RULES}")
+            except (OSError, ValueError, KeyError, re.error) as e:
+                print(f"DEBUG ocr_rules - Ignoring invalid {OCR_RULES}: {e}")
+                _default = (OCR_RULES, mtime, None)
+        return _default[2]
+
+def correct(text: str) -> str:
+    """Apply the configured rules (if any) to OCR text."""
+    rules = default_rules()
+    return rules.correct(text) if rules and text else text
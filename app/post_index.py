@@ -0,0 +1,150 @@
+import os, re, json, html, time, threading
+from datetime import datetime, timedelta
+from . import wp_client
+
+# Statuses a duplicate could be sitting in; WordPress accepts a comma-separated list
+INDEX_STATUSES = "publish,draft,pending,future,private"
+INDEX_FIELDS = "id,title,date,link,status,modified"
+
+WP_POST_INDEX = (os.getenv("WP_POST_INDEX") or os.path.join(os.path.dirname(os.path.dirname(__file__)), ".wp_post_index.json")).strip()
+WP_ON_DUPLICATE = os.getenv("WP_ON_DUPLICATE", "skip").strip().lower()  # skip | update
+WP_POST_INDEX_MAX_AGE = float(os.getenv("WP_POST_INDEX_MAX_AGE", "300"))
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+def normalize_title(title: str) -> str:
+    return _NON_WORD.sub(" ", html.unescape(title or "")).casefold().strip()
+
+def post_key(date_iso: str, title: str) -> str:
+    """Day of the post plus its normalized title, e.g. '1976-01-02|the equal rights amendment'."""
+    return f"{(date_iso or '')[:10]}|{normalize_title(title)}"
+
+class PostIndex:
+    """Local index of the category's existing posts, keyed by post_key().
+
+    rebuild() pages through the whole category; refresh() asks only for posts
+    modified after the stored watermark and merges them. The index is saved as
+    JSON so restarts don't refetch everything. publish() consults it before
+    creating a post so a retried publish can't double-post.
+    """
+
+    def __init__(self, category_id: int, path: str = "", max_age: float = 300.0):
+        self.category_id = category_id
+        self.path = path
+        self.max_age = max_age           # seconds before a lookup miss triggers a refresh
+        self.posts = {}                  # post_key -> {"id", "link", "status", "modified"}
+        self.watermark = ""              # latest "modified" seen (site-local ISO)
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path): return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f: snap = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"DEBUG post index - Ignoring unreadable {self.path}: {e}")
+            return
+        if snap.get("category_id") != self.category_id: return
+        self.posts = snap.get("posts", {})
+        self.watermark = snap.get("watermark", "")
+
+    def _save(self):
+        if not self.path: return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"category_id": self.category_id, "watermark": self.watermark, "posts": self.posts}, f)
+        os.replace(tmp, self.path)
+
+    def _merge(self, posts):
+        for p in posts:
+            title = (p.get("title") or {}).get("rendered", "")
+            self.posts[post_key(p.get("date", ""), title)] = {
+                "id": p.get("id"), "link": p.get("link", ""), "status": p.get("status", ""),
+                "modified": p.get("modified", "")}
+            if p.get("modified", "") > self.watermark: self.watermark = p["modified"]
+
+    def rebuild(self):
+        with self._lock: return self._rebuild()
+
+    def _rebuild(self):
+        posts = wp_client.fetch_posts_by_category(self.category_id, status=INDEX_STATUSES, fields=INDEX_FIELDS)
+        self.posts = {}; self.watermark = ""
+        self._merge(posts)
+        self.refreshed_at = time.time()
+        self._save()
+        return len(posts)
+
+    def refresh(self):
+        """Pull posts modified since the watermark (a full rebuild when there is none).
+
+        Callers that queued behind a refresh which finished meanwhile reuse it
+        instead of fetching again, so concurrent publishers on a fresh index
+        trigger one category fetch, not one each.
+        """
+        requested = time.time()
+        with self._lock:
+            if self.refreshed_at >= requested: return 0
+            if not self.watermark: return self._rebuild()
+            # Overlap by a minute: modified_after is exclusive and second-granular
+            since = (datetime.fromisoformat(self.watermark) - timedelta(minutes=1)).isoformat()
+            posts = wp_client.fetch_posts_by_category(self.category_id, status=INDEX_STATUSES,
+                                                      modified_after=since, fields=INDEX_FIELDS)
+            self._merge(posts)
+            self.refreshed_at = time.time()
+            if posts: self._save()
+            return len(posts)
+
+    def mark_stale(self): self.refreshed_at = 0.0
+
+    def lookup(self, date_iso: str, title: str):
+        """Existing post for (date, title), refreshing first if the index is older than max_age."""
+        key = post_key(date_iso, title)
+        hit = self.posts.get(key)
+        if hit is None and time.time() - self.refreshed_at > self.max_age:
+            self.refresh()
+            hit = self.posts.get(key)
+        return hit
+
+    def record(self, date_iso: str, title: str, res: dict, status: str):
+        with self._lock:
+            self.posts[post_key(date_iso, title)] = {"id": res.get("id"), "link": res.get("URL", ""),
+                                                     "status": status, "modified": ""}
+            self._save()
+
+    def publish(self, title: str, content: str, date_iso: str, status: str = "publish", on_duplicate: str = None):
+        """create_post unless the post already exists; then skip (default) or update it in place.
+
+        The result carries "duplicate": True when an existing post was found. A
+        failed create marks the index stale so a retry re-checks WordPress first.
+        """
+        on_duplicate = on_duplicate or WP_ON_DUPLICATE
+        existing = self.lookup(date_iso, title)
+        if existing:
+            print(f"DEBUG post index - '{title}' ({date_iso[:10]}) already exists as post {existing['id']}; {on_duplicate}")
+            if on_duplicate == "update":
+                res = wp_client.update_post(existing["id"], title=title, content=content, date_iso=date_iso, status=status)
+                self.record(date_iso, title, res, status)
+            else:
+                res = {"id": existing["id"], "URL": existing["link"], "author_set": False}
+            res["duplicate"] = True
+            return res
+        try:
+            res = wp_client.create_post(title=title, content=content, date_iso=date_iso, status=status)
+        except Exception:
+            self.mark_stale()
+            raise
+        self.record(date_iso, title, res, status)
+        return res
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_index():
+    """Process-wide PostIndex for WP_CATEGORY_ID persisted at WP_POST_INDEX; None without a category."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            category_id = wp_client.ensure_category_id()
+            if category_id: _default = PostIndex(category_id, WP_POST_INDEX, WP_POST_INDEX_MAX_AGE)
+        return _default
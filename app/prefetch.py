@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+def _key(item): return (item["basename"], item.get("pdf_path"), item.get("docx_path"))
+
+class TextPrefetcher:
+    """Bounded LRU of extracted text, filled ahead of time by a small worker pool.
+
+    prefetch(items) queues extraction for items that are neither cached nor in
+    flight; get(item) returns the cached text (a hit), waits on an in-flight
+    extraction, or extracts inline (a miss). get(item, fallback=f) never
+    waits on the loader: a miss or an unfinished extraction is answered with
+    f(item), uncached, while the loader runs in the background, so slow
+    loaders (OCR) never hold up the caller.
+    """
+
+    def __init__(self, loader, workers: int = 2, capacity: int = 32):
+        self.loader = loader
+        self.capacity = max(1, capacity)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="prefetch")
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = self.waits = self.misses = self.prefetched = self.evictions = self.errors = self.fallbacks = 0
+
+    def _store(self, key, text):
+        with self._lock:
+            self._pending.pop(key, None)
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def _load(self, key, item):
+        try:
+            text = self.loader(item)
+        except Exception as e:
+            print(f"DEBUG prefetch - Extract failed for {item.get('basename')}: {e}")
+            with self._lock:
+                self._pending.pop(key, None)
+                self.errors += 1
+            raise
+        self._store(key, text)
+        return text
+
+    def prefetch(self, items):
+        """Queue background extraction; returns how many were newly submitted."""
+        submitted = 0
+        for item in items:
+            key = _key(item)
+            with self._lock:
+                if key in self._cache or key in self._pending: continue
+                self._pending[key] = self._pool.submit(self._load, key, item)
+                self.prefetched += 1
+            submitted += 1
+        return submitted
+
+    def get(self, item, fallback=None):
+        key = _key(item)
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            fut = self._pending.get(key)
+            if fut is not None: self.waits += 1
+            else: self.misses += 1
+        if fallback is not None and not (fut is not None and fut.done()):
+            if fut is None: self.prefetch([item])
+            with self._lock: self.fallbacks += 1
+            try: return fallback(item)
+            except Exception as e:
+                print(f"DEBUG prefetch - Fallback extract failed for {item.get('basename')}: {e}")
+                return ""
+        if fut is not None:
+            try: return fut.result()
+            except Exception: return ""
+        try: return self._load(key, item)
+        except Exception: return ""
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.waits + self.misses
+            return {"hits": self.hits, "waits": self.waits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                    "fallbacks": self.fallbacks, "prefetched": self.prefetched, "evictions": self.evictions, "errors": self.errors,
+                    "cached": len(self._cache), "in_flight": len(self._pending), "capacity": self.capacity}
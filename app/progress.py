@@ -0,0 +1,213 @@
+import os, io, csv, sqlite3, threading
+from abc import ABC, abstractmethod
+from . import utils
+
+DONE_STATUSES = ("published","draft","skipped")
+
+class ProgressStore(ABC):
+    """Done-set plus catalog cursor shared by the progress backends.
+
+    Subclasses implement sync() (pull rows written since the last call into
+    self.done), append(row) and iter_csv(). The cursor remembers how far the
+    leading run of done items in the date-sorted catalog reaches, so
+    next_item() does not rescan from the start on every call.
+    """
+
+    def __init__(self):
+        self.done = set()
+        self._cursor = 0
+        self._cursor_version = None  # catalog version the cursor was computed against
+        self._lock = threading.Lock()
+
+    def _reset(self):
+        self.done = set()
+        self._cursor = 0; self._cursor_version = None
+
+    @abstractmethod
+    def sync(self): ...
+
+    @abstractmethod
+    def append(self, row: dict): ...
+
+    @abstractmethod
+    def iter_csv(self): ...
+
+    def is_done(self, basename: str) -> bool:
+        self.sync()
+        return basename in self.done
+
+    def next_item(self, items, version=None):
+        """First item in `items` not yet done. Pass the catalog version so inserts reset the cursor."""
+        self.sync()
+        with self._lock:
+            if version is None or version != self._cursor_version or self._cursor > len(items):
+                self._cursor = 0; self._cursor_version = version
+            i = self._cursor
+            while i < len(items) and items[i]["basename"] in self.done: i += 1
+            self._cursor = i
+            return items[i] if i < len(items) else None
+
+    def upcoming(self, items, n: int, version=None):
+        """Up to n not-done items starting from the next one (used for prefetching)."""
+        first = self.next_item(items, version)
+        if first is None or n <= 0: return []
+        out = [first]
+        with self._lock:
+            i = self._cursor + 1
+            while i < len(items) and len(out) < n:
+                if items[i]["basename"] not in self.done: out.append(items[i])
+                i += 1
+        return out
+
+
+class CsvProgressStore(ProgressStore):
+    """progress_log.csv backend that only parses appended rows.
+
+    The done set is built once; later syncs seek to the byte offset already
+    consumed and read just the new tail.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.offset = 0
+        self.fieldnames = None
+        self._sig = None  # (st_dev, st_ino) of the file we have been reading
+        self._write_lock = threading.Lock()
+
+    def _reset(self):
+        super()._reset()
+        self.offset = 0; self.fieldnames = None
+
+    def sync(self):
+        """Parse rows appended since the last sync. Returns how many were read."""
+        with self._lock:
+            try: st = os.stat(self.path)
+            except FileNotFoundError:
+                if self.offset: self._reset()
+                return 0
+            sig = (st.st_dev, st.st_ino)
+            if sig != self._sig or st.st_size < self.offset:
+                # Replaced or truncated: start over
+                self._reset(); self._sig = sig
+            if st.st_size == self.offset: return 0
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                chunk = f.read(st.st_size - self.offset)
+            # Only consume whole lines; a row still being written is picked up next time
+            end = chunk.rfind(b"\n")
+            if end < 0: return 0
+            self.offset += end + 1
+            reader = csv.reader(io.StringIO(chunk[:end + 1].decode("utf-8"), newline=""))
+            if self.fieldnames is None:
+                self.fieldnames = next(reader, None) or []
+            status_i = self.fieldnames.index("status") if "status" in self.fieldnames else None
+            name_i = self.fieldnames.index("basename") if "basename" in self.fieldnames else None
+            n = 0
+            for r in reader:
+                n += 1
+                if status_i is None or name_i is None: continue
+                if len(r) > max(status_i, name_i) and r[status_i] in DONE_STATUSES:
+                    self.done.add(r[name_i])
+            return n
+
+    def append(self, row: dict):
+        # Serialize writers so concurrent requests can't interleave partial rows
+        with self._write_lock:
+            utils.append_log(self.path, row)
+
+    def iter_csv(self, chunk_size: int = 64 * 1024):
+        utils.ensure_csv(self.path)
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            while True:
+                block = f.read(chunk_size)
+                if not block: break
+                yield block
+
+
+class SqliteProgressStore(ProgressStore):
+    """SQLite (WAL) backend with the same row schema as progress_log.csv.
+
+    On first use an empty database imports the existing CSV log. sync() pulls
+    done rows with an id above the last one seen, using the status index, and
+    is_done() can answer from the basename index without a file scan.
+    """
+
+    def __init__(self, db_path: str, import_csv: str = ""):
+        super().__init__()
+        self.db_path = db_path
+        self.last_id = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db_lock = threading.Lock()  # every use of the shared self._conn, reads included
+        self._init_db(import_csv)
+
+    def _init_db(self, import_csv: str):
+        cols = ", ".join(f"{name} TEXT NOT NULL DEFAULT ''" for name in utils.LOG_FIELDS)
+        with self._db_lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS progress (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols})")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_progress_basename ON progress(basename)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_progress_status ON progress(status)")
+            empty = self._conn.execute("SELECT 1 FROM progress LIMIT 1").fetchone() is None
+        if empty and import_csv and os.path.exists(import_csv):
+            n = self.import_csv(import_csv)
+            print(f"DEBUG progress - Imported {n} rows from {import_csv} into {self.db_path}")
+
+    def import_csv(self, path: str):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = [[r.get(name) or "" for name in utils.LOG_FIELDS] for r in csv.DictReader(f)]
+        self._insert_many(rows)
+        return len(rows)
+
+    def _insert_many(self, rows):
+        marks = ",".join("?" for _ in utils.LOG_FIELDS)
+        with self._db_lock, self._conn:
+            self._conn.executemany(f"INSERT INTO progress ({','.join(utils.LOG_FIELDS)}) VALUES ({marks})", rows)
+
+    def append(self, row: dict):
+        self._insert_many([["" if v is None else str(v) for v in utils.log_row_values(row)]])
+
+    def sync(self):
+        marks = ",".join("?" for _ in DONE_STATUSES)
+        with self._lock, self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT id, basename FROM progress WHERE id > ? AND status IN ({marks}) ORDER BY id",
+                (self.last_id, *DONE_STATUSES)).fetchall()
+            for row_id, basename in rows:
+                self.done.add(basename)
+                self.last_id = row_id
+            return len(rows)
+
+    def is_done(self, basename: str) -> bool:
+        marks = ",".join("?" for _ in DONE_STATUSES)
+        with self._db_lock:
+            return self._conn.execute(
+                f"SELECT 1 FROM progress WHERE basename = ? AND status IN ({marks}) LIMIT 1",
+                (basename, *DONE_STATUSES)).fetchone() is not None
+
+    def iter_csv(self, batch: int = 500):
+        """CSV export in insertion order, streamed from its own connection."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            buf = io.StringIO()
+            w = csv.writer(buf)
+            w.writerow(utils.LOG_FIELDS)
+            cur = conn.execute(f"SELECT {','.join(utils.LOG_FIELDS)} FROM progress ORDER BY id")
+            while True:
+                rows = cur.fetchmany(batch)
+                if not rows: break
+                w.writerows(rows)
+                yield buf.getvalue()
+                buf.seek(0); buf.truncate(0)
+            if buf.tell(): yield buf.getvalue()
+        finally:
+            conn.close()
+
+
+def open_store(backend: str, csv_path: str, db_path: str = ""):
+    """PROGRESS_BACKEND=csv (default) or sqlite; the sqlite store imports csv_path when new."""
+    backend = (backend or "csv").strip().lower()
+    if backend == "csv": return CsvProgressStore(csv_path)
+    if backend == "sqlite": return SqliteProgressStore(db_path, import_csv=csv_path)
+    raise ValueError(f"Unknown PROGRESS_BACKEND '{backend}' (expected csv or sqlite)")
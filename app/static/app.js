@@ -21,12 +21,19 @@ function updateDateHuman(){
 
 function setViewer(){
   const iframe = document.getElementById("doc-viewer");
+  const preview = document.getElementById("pdf-preview");
+  preview.hidden = true;
   if(!currentItem){ iframe.src=""; return; }
   if(showing==="pdf" && currentItem.pdf_url){ iframe.src=currentItem.pdf_url; }
   else if(showing==="docx" && currentItem.docx_html_url){ iframe.src=currentItem.docx_html_url; }
   else if(currentItem.pdf_url){ showing="pdf"; iframe.src=currentItem.pdf_url; }
   else if(currentItem.docx_html_url){ showing="docx"; iframe.src=currentItem.docx_html_url; }
   else { iframe.src=""; }
+  // Show the cached low-res first page until the PDF viewer has loaded
+  if(showing==="pdf" && currentItem.pdf_url && currentItem.pdf_preview_url){
+    preview.src = currentItem.pdf_preview_url;
+    preview.hidden = false;
+  }
 }
 
 async function loadNext(){
@@ -58,12 +65,46 @@ async function doCleanup(){
   document.getElementById("editor").value = res.text;
 }
 
+function ocrProgress(job){
+  return job.total ? `Re-OCR in progress... page ${job.done}/${job.total}` : "Re-OCR in progress...";
+}
+
+function finishOCR(job, basename){
+  if(!currentItem || currentItem.basename !== basename) return;  // operator moved on
+  if(job.status === "done"){
+    document.getElementById("editor").value = job.text || "";
+    setStatus("Re-OCR complete.");
+  } else {
+    setStatus("Re-OCR failed: " + (job.error || "unknown error"));
+  }
+}
+
 async function doReOCR(){
   if(!currentItem || !currentItem.has_pdf){ alert("No PDF available to OCR."); return; }
-  setStatus("Re-OCR in progress...");
-  const res = await getJSON("/api/ocr",{method:"POST",headers:{"Content-Type":"application/json"},body:JSON.stringify({basename: currentItem.basename})});
-  document.getElementById("editor").value = res.text || "";
-  setStatus("Re-OCR complete.");
+  const basename = currentItem.basename;
+  setStatus("Re-OCR queued...");
+  const job = await getJSON("/api/ocr/jobs",{method:"POST",headers:{"Content-Type":"application/json"},body:JSON.stringify({basename})});
+  const events = new EventSource(job.events_url);
+  events.addEventListener("progress", (e)=>{
+    if(currentItem && currentItem.basename === basename) setStatus(ocrProgress(JSON.parse(e.data)));
+  });
+  events.addEventListener("done", (e)=>{ events.close(); finishOCR(JSON.parse(e.data), basename); });
+  events.onerror = async ()=>{
+    // Stream dropped: fall back to polling the job
+    events.close();
+    try{
+      let res = await getJSON(job.status_url);
+      while(res.status !== "done" && res.status !== "error"){
+        if(currentItem && currentItem.basename === basename) setStatus(ocrProgress(res));
+        await new Promise(r=>setTimeout(r, 1000));
+        res = await getJSON(job.status_url);
+      }
+      finishOCR(res, basename);
+    } catch(err){
+      // e.g. a 404 once the job has been evicted from the server's history
+      finishOCR({status: "error", error: "job no longer available"}, basename);
+    }
+  };
 }
 
 async function postStatus(kind){
@@ -87,6 +128,8 @@ document.getElementById("reocr").addEventListener("click", doReOCR);
 document.getElementById("publish").addEventListener("click", ()=>postStatus("publish"));
 document.getElementById("draft").addEventListener("click", ()=>postStatus("draft"));
 document.getElementById("skip").addEventListener("click", ()=>postStatus("skip"));
+document.getElementById("doc-viewer").addEventListener("load", ()=>{ document.getElementById("pdf-preview").hidden = true; });
+document.getElementById("pdf-preview").addEventListener("error", (e)=>{ e.target.hidden = true; });
 document.getElementById("show-pdf").addEventListener("click", ()=>{showing="pdf"; setViewer();});
 document.getElementById("show-docx").addEventListener("click", ()=>{showing="docx"; setViewer();});
 document.getElementById("date").addEventListener("input", updateDateHuman);
@@ -1,5 +1,6 @@
 \
 import os, re, csv, time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 DATE_RE = re.compile(r'^PSC_(\d{4})_(\d{2})_(\d{2})')
@@ -17,27 +18,33 @@ def parse_basename(stem: str):
     try: return f"{int(y):04d}-{int(mo):02d}-{int(da):02d}"
     except: return None
 
+LOG_FIELDS = ["timestamp","year_folder","basename","has_pdf","has_docx","date_parsed",
+              "title","status","ocr_used","cleanup_applied",
+              "wp_post_id","wp_url","author_set","error_message"]
+
 def ensure_csv(path: str):
     if not os.path.exists(path):
         with open(path, 'w', newline='', encoding='utf-8') as f:
             w = csv.writer(f)
-            w.writerow(["timestamp","year_folder","basename","has_pdf","has_docx","date_parsed",
-                        "title","status","ocr_used","cleanup_applied",
-                        "wp_post_id","wp_url","author_set","error_message"])
+            w.writerow(LOG_FIELDS)
+
+def log_row_values(row: dict):
+    """Progress row dict -> values in LOG_FIELDS order, formatted as the CSV log stores them."""
+    return [
+        row.get("timestamp", time.strftime("%Y-%m-%d %H:%M:%S")),
+        row.get("year_folder",""), row.get("basename",""),
+        str(row.get("has_pdf", False)), str(row.get("has_docx", False)),
+        row.get("date_parsed",""), row.get("title",""), row.get("status",""),
+        str(row.get("ocr_used", False)), str(row.get("cleanup_applied", False)),
+        row.get("wp_post_id",""), row.get("wp_url",""),
+        str(row.get("author_set", False)), row.get("error_message",""),
+    ]
 
 def append_log(path: str, row: dict):
     ensure_csv(path)
     with open(path, 'a', newline='', encoding='utf-8') as f:
         w = csv.writer(f)
-        w.writerow([
-            row.get("timestamp", time.strftime("%Y-%m-%d %H:%M:%S")),
-            row.get("year_folder",""), row.get("basename",""),
-            str(row.get("has_pdf", False)), str(row.get("has_docx", False)),
-            row.get("date_parsed",""), row.get("title",""), row.get("status",""),
-            str(row.get("ocr_used", False)), str(row.get("cleanup_applied", False)),
-            row.get("wp_post_id",""), row.get("wp_url",""),
-            str(row.get("author_set", False)), row.get("error_message",""),
-        ])
+        w.writerow(log_row_values(row))
 
 def read_done_set(path: str):
     done = set()
@@ -49,27 +56,60 @@ def read_done_set(path: str):
                 done.add(r.get("basename",""))
     return done
 
-def list_items(source_root: str):
-    items = []
+def scan_year_dir(year_dir: str, year_folder: str):
+    """Single os.scandir pass over one year folder; returns {basename: item}."""
+    recs = {}
+    with os.scandir(year_dir) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for e in entries:
+        if not e.name.startswith("PSC_"): continue
+        stem, ext = os.path.splitext(e.name)
+        ext = ext.lower()
+        if ext not in (".pdf",".docx"): continue
+        if not e.is_file(): continue
+        iso = parse_basename(stem)
+        if not iso: continue
+        rec = recs.get(stem)
+        if not rec:
+            rec = {"year_folder": year_folder, "basename": stem, "pdf_path": None, "docx_path": None, "date_parsed": iso}
+            recs[stem] = rec
+        if ext == ".pdf": rec["pdf_path"] = e.path
+        else: rec["docx_path"] = e.path
+    return recs
+
+def list_year_dirs(source_root: str):
+    """Sorted [(year_folder, year_dir)] for the numeric folders under source_root."""
+    with os.scandir(source_root) as it:
+        return sorted((e.name, e.path) for e in it if e.name.isdigit() and e.is_dir())
+
+def merge_year_recs(items_by_name: dict, recs: dict):
+    # A basename seen in an earlier year folder keeps that record; later folders only fill in paths
+    for stem, rec in recs.items():
+        cur = items_by_name.get(stem)
+        if not cur:
+            items_by_name[stem] = rec
+            continue
+        if rec["pdf_path"]: cur["pdf_path"] = rec["pdf_path"]
+        if rec["docx_path"]: cur["docx_path"] = rec["docx_path"]
+
+def scan_year_dirs(year_dirs, workers: int = 0):
+    """scan_year_dir over [(year_folder, year_dir)], in order; workers > 1 uses a thread pool."""
+    if workers and workers > 1 and len(year_dirs) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda yd: scan_year_dir(yd[1], yd[0]), year_dirs))
+    return [scan_year_dir(path, entry) for entry, path in year_dirs]
+
+def list_items(source_root: str, workers: int = 0):
+    """Catalog of PSC_* items sorted by date. workers > 1 scans year folders in parallel."""
     source_root = os.path.abspath(source_root)
-    if not os.path.isdir(source_root): return items
-    for entry in sorted(os.listdir(source_root)):
-        year_dir = os.path.join(source_root, entry)
-        if not os.path.isdir(year_dir): continue
-        if not entry.isdigit(): continue
-        for fname in sorted(os.listdir(year_dir)):
-            p = os.path.join(year_dir, fname)
-            if not os.path.isfile(p): continue
-            stem, ext = os.path.splitext(fname)
-            if not stem.startswith("PSC_"): continue
-            if ext.lower() not in (".pdf",".docx"): continue
-            iso = parse_basename(stem)
-            if not iso: continue
-            rec = next((x for x in items if x["basename"] == stem), None)
-            if not rec:
-                rec = {"year_folder": entry, "basename": stem, "pdf_path": None, "docx_path": None, "date_parsed": iso}
-                items.append(rec)
-            if ext.lower() == ".pdf": rec["pdf_path"] = p
-            else: rec["docx_path"] = p
+    if not os.path.isdir(source_root): return []
+    items_by_name = {}
+    for recs in scan_year_dirs(list_year_dirs(source_root), workers):
+        merge_year_recs(items_by_name, recs)
+    items = list(items_by_name.values())
     items.sort(key=lambda x: x["date_parsed"])
     return items
+
+def index_items(items):
+    """basename -> item lookup for a catalog list (items are shared, not copied)."""
+    return {it["basename"]: it for it in items}
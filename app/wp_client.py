@@ -1,6 +1,7 @@
 \
-import os, requests, csv, html, io
+import os, csv, html, io, json, time, threading
 from dotenv import load_dotenv
+from .wp_rest import client_from_env, POST_RETRY_STATUSES, POST_LIST_FIELDS, read_json_response
 load_dotenv()
 
 WP_BASE = os.getenv("WP_BASE","").rstrip("/")
@@ -10,21 +11,15 @@ WP_AUTHOR_NAME = os.getenv("WP_AUTHOR_NAME","").strip()
 WP_CATEGORY_ID = os.getenv("WP_CATEGORY_ID", "72")  # Default to hardcoded ID
 WP_CATEGORY_NAME = os.getenv("WP_CATEGORY_NAME", "Phyllis Schlafly Report Column")  # Default to hardcoded name
 WP_CATEGORY_SLUG = os.getenv("WP_CATEGORY_SLUG", "phyllis-schlafly-report-column")  # Default to hardcoded slug
+WP_RESOLVE_TTL = float(os.getenv("WP_RESOLVE_TTL", "86400"))  # Seconds to trust a cached author lookup
+WP_RESOLVE_CACHE = os.getenv("WP_RESOLVE_CACHE", "").strip()   # Optional JSON file to persist lookups across restarts
 
-API = f"{WP_BASE}/wp-json/wp/v2"
-session = requests.Session()
-session.auth = (WP_USERNAME, WP_APP_PASSWORD)
-
-# Add headers to bypass Cloudflare bot protection
-session.headers.update({
-    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Accept': 'application/json, */*',
-    'Accept-Language': 'en-US,en;q=0.9',
-    'Accept-Encoding': 'gzip, deflate, br',
-    'DNT': '1',
-    'Connection': 'keep-alive',
-    'Upgrade-Insecure-Requests': '1',
-})
+client = client_from_env(WP_BASE, WP_USERNAME, WP_APP_PASSWORD)
+API = client.api
+session = client.session
+rate_limiter = client.rate_limiter
+request = client.request
+metrics = client.metrics
 
 # Debug: Print authentication info
 print(f"DEBUG WP - WP_BASE: '{WP_BASE}'")
@@ -35,15 +30,68 @@ print(f"DEBUG WP - Category ID: '{WP_CATEGORY_ID}'")
 print(f"DEBUG WP - Category Name: '{WP_CATEGORY_NAME}'")
 print(f"DEBUG WP - Category Slug: '{WP_CATEGORY_SLUG}'")
 
+class ResolutionCache:
+    """TTL cache for WordPress ID lookups (author, etc.), optionally persisted as JSON.
+
+    Negative outcomes are cached too: a lookup that returned None (no match, or
+    a 403 because the account may not search users) is remembered for the TTL
+    instead of being retried before every post.
+    """
+
+    def __init__(self, ttl: float, path: str = ""):
+        self.ttl = ttl
+        self.path = path
+        self.entries = {}  # key -> [value, expires_at]
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = {k: v for k, v in json.load(f).items() if v[1] > time.time()}
+            except (OSError, ValueError) as e:
+                print(f"DEBUG WP - Ignoring unreadable resolution cache {path}: {e}")
+
+    def get(self, key: str):
+        """(hit, value); expired entries are misses."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > time.time(): return True, entry[0]
+            return False, None
+
+    def set(self, key: str, value):
+        with self.lock:
+            self.entries[key] = [value, time.time() + self.ttl]
+            if not self.path: return
+            try:
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f: json.dump(self.entries, f)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"DEBUG WP - Could not persist resolution cache: {e}")
+
+    def clear(self):
+        with self.lock: self.entries.clear()
+
+resolution_cache = ResolutionCache(WP_RESOLVE_TTL, WP_RESOLVE_CACHE)
+
+def _author_key(): return f"author:{WP_BASE}:{WP_AUTHOR_NAME}"
+
 def resolve_author_id():
     if not WP_AUTHOR_NAME: return None
+    hit, author_id = resolution_cache.get(_author_key())
+    if hit: return author_id
+    found, author_id = _lookup_author_id()
+    if found: resolution_cache.set(_author_key(), author_id)
+    return author_id
+
+def _lookup_author_id():
+    """(definitive, author_id). Transport errors are not definitive and are not cached."""
     try:
         print(f"DEBUG WP - Searching for author: '{WP_AUTHOR_NAME}'")
-        r = session.get(f"{API}/users", params={"search": WP_AUTHOR_NAME, "per_page": 100}, timeout=30)
+        r = request("GET", f"{API}/users", params={"search": WP_AUTHOR_NAME, "per_page": 100}, timeout=30)
         print(f"DEBUG WP - Author search response status: {r.status_code}")
-        if r.status_code == 403: 
-            print("DEBUG WP - Author search forbidden (403)")
-            return None
+        if r.status_code in (401, 403):
+            print(f"DEBUG WP - Author search forbidden ({r.status_code})")
+            return True, None
         if r.status_code == 200:
             try:
                 users = r.json()
@@ -55,13 +103,19 @@ def resolve_author_id():
                         u.get("username")==WP_AUTHOR_NAME or
                         u.get("username")=="phyllis-wp"):  # Explicit check for phyllis-wp
                         print(f"DEBUG WP - Found matching author ID: {u.get('id')}")
-                        return u.get("id")
+                        return True, u.get("id")
+                return True, None
             except ValueError as e:
                 print(f"DEBUG WP - Failed to parse author JSON: {e}")
-        return None
+        return False, None
     except Exception as e:
         print(f"DEBUG WP - Exception in resolve_author_id: {e}")
-        return None
+        return False, None
+
+def warm_resolution_cache():
+    """Resolve the author up front (in the background at app start) so the first publish doesn't pay for it."""
+    try: resolve_author_id()
+    except Exception as e: print(f"DEBUG WP - Resolution cache warm-up failed: {e}")
 
 def ensure_category_id():
     """Returns the hardcoded category ID instead of searching for it."""
@@ -85,7 +139,9 @@ def create_post(title: str, content: str, date_iso: str, status: str="publish"):
         except ValueError:
             pass
 
-    author_id = resolve_author_id()
+    author_id = None
+    hit, forbidden = resolution_cache.get(f"{_author_key()}:post_forbidden")
+    if not (hit and forbidden): author_id = resolve_author_id()
     tried_author = False
     if author_id:
         payload["author"] = author_id
@@ -94,73 +150,67 @@ def create_post(title: str, content: str, date_iso: str, status: str="publish"):
     print(f"DEBUG WP - Posting to: {API}/posts")
     print(f"DEBUG WP - Payload: {payload}")
     print(f"DEBUG WP - Auth: {session.auth}")
-    r = session.post(f"{API}/posts", json=payload, timeout=45)
+    r = request("POST", f"{API}/posts", retry_statuses=POST_RETRY_STATUSES, json=payload, timeout=45)
     print(f"DEBUG WP - Response status: {r.status_code}")
     print(f"DEBUG WP - Response text: {r.text[:500]}")
     if r.status_code == 403 and tried_author:
+        # This account may not set post authors; stop trying for the TTL
+        resolution_cache.set(f"{_author_key()}:post_forbidden", True)
         payload.pop("author", None)
-        r = session.post(f"{API}/posts", json=payload, timeout=45)
+        r = request("POST", f"{API}/posts", retry_statuses=POST_RETRY_STATUSES, json=payload, timeout=45)
         author_set = False
     else:
         r.raise_for_status()
         author_set = bool(author_id and r.status_code in (200,201))
 
-    data = r.json()
+    data = read_json_response(r, "Create post")
     return {"id": data.get("id"), "URL": data.get("link"), "author_set": author_set}
 
-def _chunked(seq, size: int):
-    for i in range(0, len(seq), size):
-        yield seq[i:i + size]
-
-def _get_posts_page(category_id: int, page: int, per_page: int, status: str):
-    params = {
-        "categories": category_id,
-        "per_page": per_page,
-        "page": page,
-        "status": status,
-        "_fields": "id,title,date,categories,link",
-    }
-    r = session.get(f"{API}/posts", params=params, timeout=45)
+def update_post(post_id: int, title: str, content: str, date_iso: str, status: str="publish"):
+    """Overwrite an existing post's title/content/date/status (used instead of creating a duplicate)."""
+    payload = {"title": title, "content": content, "status": status, "date": date_iso}
+    r = request("POST", f"{API}/posts/{post_id}", retry_statuses=POST_RETRY_STATUSES, json=payload, timeout=45)
     r.raise_for_status()
-    total_pages = int(r.headers.get("X-WP-TotalPages", "1"))
-    return r.json(), total_pages
-
-def fetch_posts_by_category(category_id: int, status: str="publish"):
-    posts = []
-    page = 1
-    per_page = 100
-    total_pages = 1
-    while page <= total_pages:
-        page_posts, total_pages = _get_posts_page(category_id, page, per_page, status)
-        if not page_posts:
-            break
-        posts.extend(page_posts)
-        page += 1
-    return posts
+    data = read_json_response(r, f"Update post {post_id}")
+    return {"id": data.get("id"), "URL": data.get("link"), "author_set": False}
 
-def fetch_category_map(category_ids):
-    if not category_ids:
-        return {}
-    cat_map = {}
-    for chunk in _chunked(list(category_ids), 100):
-        params = {
-            "include": ",".join(str(cid) for cid in chunk),
-            "per_page": 100,
-            "_fields": "id,name",
-        }
-        r = session.get(f"{API}/categories", params=params, timeout=30)
-        r.raise_for_status()
-        for c in r.json():
-            cat_map[c.get("id")] = c.get("name", "")
-    return cat_map
+def fetch_posts_by_category(category_id: int, status: str="publish", modified_after: str=None, fields: str=POST_LIST_FIELDS):
+    """All posts in a category. modified_after (site-local ISO datetime) limits it to posts changed since then."""
+    return client.fetch_posts(category_id, status, fields, modified_after)
 
-def export_posts_csv(category_id: int, status: str="publish") -> str:
-    posts = fetch_posts_by_category(category_id, status=status)
-    all_other_cat_ids = {
-        cid for p in posts for cid in p.get("categories", []) if cid != category_id
-    }
-    cat_map = fetch_category_map(all_other_cat_ids)
+def iter_posts_by_category(category_id: int, status: str="publish", modified_after: str=None, fields: str=POST_LIST_FIELDS):
+    """Like fetch_posts_by_category, but yields one page (list of posts) at a time as they arrive."""
+    return client.iter_posts(category_id, status, fields, modified_after)
 
+def fetch_category_map(category_ids):
+    return client.fetch_category_map(category_ids)
+
+_category_names = {}  # category id -> name, filled in batches as exports meet new ids
+_category_names_lock = threading.Lock()
+
+def category_names(category_ids):
+    """Names for the given ids, fetching only the ones not seen before (100 per request)."""
+    with _category_names_lock:
+        missing = [cid for cid in set(category_ids) if cid not in _category_names]
+    if missing:
+        found = fetch_category_map(missing)
+        with _category_names_lock:
+            for cid in missing: _category_names[cid] = found.get(cid, "")
+    with _category_names_lock:
+        return {cid: _category_names.get(cid, "") for cid in category_ids}
+
+def sync_mirror(mirror, category_id: int, full: bool=False):
+    """Bring a wp_mirror.PostMirror up to date for the category using this client's session."""
+    return client.sync_mirror(mirror, category_id, full)
+
+def count_posts(category_id: int, status: str="publish") -> int:
+    return client.count_posts(category_id, status)
+
+def iter_posts_csv(category_id: int, status: str="publish", pages=None):
+    """CSV text for a category's posts, yielded a page at a time so the response can stream.
+
+    pages: iterable of post lists to export instead of fetching live (e.g. from a PostMirror).
+    """
     output = io.StringIO()
     writer = csv.writer(output)
     writer.writerow([
@@ -170,15 +220,28 @@ def export_posts_csv(category_id: int, status: str="publish") -> str:
         "additional_category_ids",
         "additional_category_names",
     ])
-    for p in posts:
-        cat_ids = [cid for cid in p.get("categories", []) if cid != category_id]
-        cat_names = [cat_map.get(cid, "") for cid in cat_ids]
-        title = html.unescape((p.get("title") or {}).get("rendered", "")).strip()
-        writer.writerow([
-            p.get("id", ""),
-            title,
-            p.get("date", ""),
-            ",".join(str(cid) for cid in cat_ids),
-            ",".join(name for name in cat_names if name),
-        ])
-    return output.getvalue()
+    # The header goes out on its own, so an empty category or status still exports a valid CSV
+    yield output.getvalue()
+    output.seek(0)
+    output.truncate(0)
+    for posts in (pages if pages is not None else iter_posts_by_category(category_id, status=status)):
+        cat_map = category_names({
+            cid for p in posts for cid in p.get("categories", []) if cid != category_id
+        })
+        for p in posts:
+            cat_ids = [cid for cid in p.get("categories", []) if cid != category_id]
+            cat_names = [cat_map.get(cid, "") for cid in cat_ids]
+            title = html.unescape((p.get("title") or {}).get("rendered", "")).strip()
+            writer.writerow([
+                p.get("id", ""),
+                title,
+                p.get("date", ""),
+                ",".join(str(cid) for cid in cat_ids),
+                ",".join(name for name in cat_names if name),
+            ])
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate(0)
+
+def export_posts_csv(category_id: int, status: str="publish") -> str:
+    return "".join(iter_posts_csv(category_id, status=status))
@@ -0,0 +1,85 @@
+import json, time, sqlite3, threading
+from datetime import datetime, timedelta
+
+# Statuses mirrored, so a post that moves from publish to draft is updated rather than left stale
+MIRROR_STATUSES = "publish,draft,pending,future,private"
+MIRROR_FIELDS = "id,title,date,categories,link,status,modified"
+
+class PostMirror:
+    """Local SQLite mirror of post metadata per category, synced by modified date.
+
+    sync() asks WordPress only for posts modified after the stored watermark
+    (everything on the first run or with full=True) and upserts them. If a
+    count callable is given and the mirrored publish count disagrees with
+    WordPress afterwards (e.g. a post was deleted), it falls back to a full
+    resync. iter_pages() then serves WP-shaped post dicts from the mirror.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS posts (
+                category_id INTEGER NOT NULL, id INTEGER NOT NULL, title TEXT, date TEXT, link TEXT,
+                status TEXT, modified TEXT, categories TEXT, PRIMARY KEY (category_id, id))""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_order ON posts(category_id, status, date)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS sync_state (category_id INTEGER PRIMARY KEY, watermark TEXT, synced_at REAL)")
+
+    def watermark(self, category_id: int) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT watermark FROM sync_state WHERE category_id = ?", (category_id,)).fetchone()
+        return row[0] if row and row[0] else ""
+
+    def _upsert(self, category_id: int, posts, replace_all: bool):
+        rows = [(category_id, p.get("id"), (p.get("title") or {}).get("rendered", ""), p.get("date", ""),
+                 p.get("link", ""), p.get("status", ""), p.get("modified", ""), json.dumps(p.get("categories", [])))
+                for p in posts]
+        watermark = max((r[6] for r in rows), default="")
+        with self._lock, self._conn:
+            if replace_all: self._conn.execute("DELETE FROM posts WHERE category_id = ?", (category_id,))
+            self._conn.executemany("INSERT OR REPLACE INTO posts VALUES (?,?,?,?,?,?,?,?)", rows)
+            old = self._conn.execute("SELECT watermark FROM sync_state WHERE category_id = ?", (category_id,)).fetchone()
+            if old and old[0] and not replace_all: watermark = max(watermark, old[0])
+            self._conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?,?,?)", (category_id, watermark, time.time()))
+
+    def count(self, category_id: int, status: str = "publish") -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM posts WHERE category_id = ? AND status = ?",
+                                      (category_id, status)).fetchone()[0]
+
+    def sync(self, category_id: int, fetch, count=None, full: bool = False):
+        """fetch(modified_after or None) -> posts with MIRROR_FIELDS; count() -> WordPress publish total."""
+        t0 = time.perf_counter()
+        since = "" if full else self.watermark(category_id)
+        if since:
+            # Overlap by a minute: modified_after is exclusive and second-granular
+            since = (datetime.fromisoformat(since) - timedelta(minutes=1)).isoformat()
+        posts = fetch(since or None)
+        self._upsert(category_id, posts, replace_all=not since)
+        mode = "delta" if since else "full"
+        if since and count is not None:
+            remote = count()
+            if remote != self.count(category_id):
+                print(f"DEBUG mirror - publish count differs (WordPress {remote}, mirror {self.count(category_id)}); full resync")
+                posts = fetch(None)
+                self._upsert(category_id, posts, replace_all=True)
+                mode = "full"
+        return {"mode": mode, "fetched": len(posts), "mirrored": self.count(category_id),
+                "watermark": self.watermark(category_id), "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+    def iter_pages(self, category_id: int, status: str = "publish", size: int = 500):
+        """Mirrored posts as WP-shaped dicts, newest first like /posts, in lists of `size`."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            cur = conn.execute("SELECT id, title, date, link, categories FROM posts "
+                               "WHERE category_id = ? AND status = ? ORDER BY date DESC, id DESC",
+                               (category_id, status))
+            while True:
+                rows = cur.fetchmany(size)
+                if not rows: break
+                yield [{"id": r[0], "title": {"rendered": r[1]}, "date": r[2], "link": r[3],
+                        "categories": json.loads(r[4] or "[]"), "status": status} for r in rows]
+        finally:
+            conn.close()
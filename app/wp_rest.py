@@ -0,0 +1,375 @@
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from .wp_mirror import MIRROR_FIELDS, MIRROR_STATUSES
+
+
+DEFAULT_HEADERS = {
+    # Browser-like headers so Cloudflare's bot protection lets the REST calls through
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/91.0.4472.124 Safari/537.36"
+    ),
+    "Accept": "application/json, */*",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate",
+    "DNT": "1",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# 429/503 mean the request was turned away; other 5xx may have created the post, so don't blindly resend
+POST_RETRY_STATUSES = (429, 503)
+POST_LIST_FIELDS = "id,title,date,categories,link"
+# Methods safe to resend after a connection dropped mid-request
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+def build_session(username: str, app_password: str, pool_size: int = 8) -> requests.Session:
+    session = requests.Session()
+    session.auth = (username, app_password)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def chunked(seq, size: int):
+    for i in range(0, len(seq), size):
+        yield seq[i : i + size]
+
+
+def read_json_response(resp: requests.Response, context: str):
+    content_type = resp.headers.get("Content-Type", "")
+    if "application/json" not in content_type:
+        snippet = (resp.text or "").strip()[:500]
+        raise RuntimeError(
+            f"{context} returned non-JSON response "
+            f"(status {resp.status_code}, content-type '{content_type}'): {snippet}"
+        )
+    try:
+        return resp.json()
+    except ValueError:
+        try:
+            snippet = resp.content[:500].decode("utf-8", errors="replace")
+        except Exception:
+            snippet = (resp.text or "").strip()[:500]
+        raise RuntimeError(
+            f"{context} returned invalid JSON "
+            f"(status {resp.status_code}, content-type '{content_type}'): {snippet}"
+        )
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `burst` banked."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def never_sent(exc: Exception) -> bool:
+    """True when a request failed before reaching the server (connect timeout, refused, DNS), so resending is safe."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    cause = exc.args[0] if exc.args else None  # requests wraps urllib3's error (a MaxRetryError's .reason)
+    return isinstance(cause, NewConnectionError) or isinstance(getattr(cause, "reason", None), NewConnectionError)
+
+
+def retry_after_seconds(resp: requests.Response) -> float:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date); 0 when absent or unparseable."""
+    value = (resp.headers.get("Retry-After") or "").strip()
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# What WPClient.request() leaves to the caller: a body cut off mid-read, or a 200 that isn't JSON (a proxy's
+# HTML page, raised by read_json_response). Status codes and connection errors it already retries itself.
+PAGE_RETRY_ERRORS = (requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError, RuntimeError)
+
+
+def _fetch_page_with_retries(get_page, page: int, retries: int, backoff: float):
+    for attempt in range(retries + 1):
+        try:
+            return get_page(page)
+        except PAGE_RETRY_ERRORS as e:
+            if attempt >= retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f"DEBUG WP - Page {page} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def iter_pages(get_page, workers: int = 4, retries: int = 2, backoff: float = 1.0):
+    """Yield each page's items, in page order, as soon as that page is available.
+
+    get_page(page) returns (items, total_pages) for a 1-based page. Page 1 is
+    fetched first to learn X-WP-TotalPages; later pages are fetched on up to
+    `workers` threads. A page whose body is cut off or isn't JSON is fetched
+    again (up to `retries` times); anything else propagates. At most 2 x workers pages are
+    in flight or buffered, so memory stays flat however many pages there are.
+    """
+    first, total_pages = _fetch_page_with_retries(get_page, 1, retries, backoff)
+    yield list(first or [])
+    if not first or total_pages <= 1:
+        return
+    remaining = iter(range(2, total_pages + 1))
+    if workers <= 1:
+        for page in remaining:
+            yield list(_fetch_page_with_retries(get_page, page, retries, backoff)[0] or [])
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wp-pages") as pool:
+        window = deque()
+        for page in remaining:
+            window.append(pool.submit(_fetch_page_with_retries, get_page, page, retries, backoff))
+            if len(window) >= 2 * workers:
+                yield list(window.popleft().result()[0] or [])
+        while window:
+            yield list(window.popleft().result()[0] or [])
+
+
+def fetch_all_pages(get_page, workers: int = 4, retries: int = 2, backoff: float = 1.0):
+    """Every item of a paginated WordPress collection, concatenated in page order (see iter_pages)."""
+    return [item for items in iter_pages(get_page, workers, retries, backoff) for item in items]
+
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class WPClient:
+    """WordPress REST client shared by the app and the export scripts.
+
+    One pooled session per client; every call goes through request(), which
+    waits on a token bucket (rate_limit for writes, read_rate_limit for GET and
+    HEAD, so throttling posts doesn't serialize concurrent paging), retries 429/5xx and connection errors with
+    full-jitter exponential backoff (honoring Retry-After), and records
+    per-endpoint timing available from metrics().
+    """
+
+    def __init__(
+        self,
+        base: str,
+        username: str,
+        app_password: str,
+        pool_size: int = 8,
+        rate_limit: float = 0.0,
+        rate_burst: int = 4,
+        read_rate_limit: float = 0.0,
+        max_retries: int = 4,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        fetch_workers: int = 4,
+    ):
+        self.base = base.rstrip("/")
+        self.api = f"{self.base}/wp-json/wp/v2"
+        self.session = build_session(username, app_password, pool_size)
+        self.pool_size = pool_size
+        self.rate_limiter = TokenBucket(rate_limit, rate_burst)
+        self.read_limiter = TokenBucket(read_rate_limit, rate_burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.fetch_workers = fetch_workers
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform over [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, key: str, elapsed: float, retried: bool, failed: bool):
+        with self._metrics_lock:
+            m = self._metrics.setdefault(key, {"calls": 0, "retries": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            if retried:
+                m["retries"] += 1
+                return
+            ms = elapsed * 1000
+            m["calls"] += 1
+            m["errors"] += int(failed)
+            m["total_ms"] += ms
+            m["max_ms"] = max(m["max_ms"], ms)
+
+    def metrics(self):
+        """{"GET /posts": {"calls", "retries", "errors", "total_ms", "max_ms", "avg_ms"}, ...}"""
+        with self._metrics_lock:
+            out = {}
+            for key, m in self._metrics.items():
+                out[key] = dict(m, total_ms=round(m["total_ms"], 1), max_ms=round(m["max_ms"], 1),
+                                avg_ms=round(m["total_ms"] / m["calls"], 1) if m["calls"] else None)
+            return out
+
+    def metrics_lines(self):
+        """One human-readable line per endpoint, slowest total first (for script summaries)."""
+        rows = sorted(self.metrics().items(), key=lambda kv: -kv[1]["total_ms"])
+        return [
+            f"{key}: {m['calls']} calls, avg {m['avg_ms']} ms, max {m['max_ms']} ms, "
+            f"{m['retries']} retries, {m['errors']} errors"
+            for key, m in rows
+        ]
+
+    def url(self, path: str) -> str:
+        return path if path.startswith("http") else f"{self.api}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, retry_statuses=RETRY_STATUSES, **kwargs):
+        """session.request behind the rate limiter, retrying retry_statuses and connection errors with backoff.
+
+        A Retry-After header, when present, takes precedence over the computed backoff.
+        The last response is returned (not raised) once retries are exhausted.
+        """
+        url = self.url(path)
+        key = f"{method.upper()} {_ID_SEGMENT.sub('/{id}', url[len(self.api):] if url.startswith(self.api) else url)}"
+        limiter = self.read_limiter if method.upper() in ("GET", "HEAD") else self.rate_limiter
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire()
+            t0 = time.perf_counter()
+            try:
+                r = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # A POST that reached the server (dropped connection, read timeout) may already have created the
+                # post, so non-idempotent requests are resent only when they never left this machine
+                if attempt >= self.max_retries or (method.upper() not in IDEMPOTENT_METHODS and not never_sent(e)):
+                    self._record(key, time.perf_counter() - t0, retried=False, failed=True)
+                    raise
+                self._record(key, 0, retried=True, failed=False)
+                delay = self._backoff(attempt)
+                print(f"DEBUG WP - {method} {url} failed ({e}); retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            elapsed = time.perf_counter() - t0
+            if r.status_code not in retry_statuses or attempt >= self.max_retries:
+                self._record(key, elapsed, retried=False, failed=r.status_code >= 400)
+                return r
+            self._record(key, 0, retried=True, failed=False)
+            delay = min(self.backoff_max, retry_after_seconds(r)) or self._backoff(attempt)
+            print(f"DEBUG WP - {method} {url} -> {r.status_code}; retry {attempt + 1} in {delay:.1f}s")
+            time.sleep(delay)
+        return r
+
+    def get_json(self, path: str, context: str, params=None, timeout: float = 30):
+        """GET, raise on HTTP errors, validate the JSON body; returns (data, response)."""
+        r = self.request("GET", path, params=params, timeout=timeout)
+        r.raise_for_status()
+        return read_json_response(r, context), r
+
+    def posts_page(self, category_id: int, page: int, status: str = "publish", fields: str = POST_LIST_FIELDS,
+                   per_page: int = 100, **extra):
+        """(posts, total_pages) for one page of a category listing."""
+        params = {
+            "categories": category_id,
+            "per_page": per_page,
+            "page": page,
+            "status": status,
+            "_fields": fields,
+            **extra,
+        }
+        posts, r = self.get_json("posts", f"Posts list (page {page})", params=params, timeout=45)
+        return posts, int(r.headers.get("X-WP-TotalPages", "1"))
+
+    def iter_posts(self, category_id: int, status: str = "publish", fields: str = POST_LIST_FIELDS,
+                   modified_after: str = None, **extra):
+        """Pages (lists) of a category's posts; modified_after (site-local ISO) limits to recent changes."""
+        if modified_after:
+            extra.update({"modified_after": modified_after, "orderby": "modified", "order": "asc"})
+        return iter_pages(
+            lambda page: self.posts_page(category_id, page, status, fields, **extra),
+            workers=self.fetch_workers,
+        )
+
+    def fetch_posts(self, category_id: int, status: str = "publish", fields: str = POST_LIST_FIELDS,
+                    modified_after: str = None, **extra):
+        return [p for page in self.iter_posts(category_id, status, fields, modified_after, **extra) for p in page]
+
+    def count_posts(self, category_id: int, status: str = "publish") -> int:
+        """X-WP-Total for the category, from a one-post page."""
+        params = {"categories": category_id, "status": status, "per_page": 1, "_fields": "id"}
+        _, r = self.get_json("posts", "Posts count", params=params)
+        return int(r.headers.get("X-WP-Total", "0"))
+
+    def fetch_category_map(self, category_ids):
+        if not category_ids:
+            return {}
+        cat_map = {}
+        for group in chunked(list(category_ids), 100):
+            params = {
+                "include": ",".join(str(cid) for cid in group),
+                "per_page": 100,
+                "_fields": "id,name",
+            }
+            cats, _ = self.get_json("categories", "Categories list", params=params)
+            for cat in cats:
+                cat_map[cat.get("id")] = cat.get("name", "")
+        return cat_map
+
+    def sync_mirror(self, mirror, category_id: int, full: bool = False):
+        """Bring a wp_mirror.PostMirror up to date for the category."""
+        return mirror.sync(
+            category_id,
+            lambda since: self.fetch_posts(category_id, MIRROR_STATUSES, MIRROR_FIELDS, modified_after=since),
+            count=lambda: self.count_posts(category_id),
+            full=full,
+        )
+
+
+def client_from_env(base: str = None, username: str = None, app_password: str = None, **overrides) -> WPClient:
+    """A WPClient configured from the WP_* environment, read at call time (after the caller's load_dotenv).
+
+    The app (app.wp_client) and both export scripts build their client here, so
+    WP_POOL_SIZE, the rate limits, retries and backoff apply everywhere.
+    Keyword overrides (e.g. a script's --workers) win unless they are None.
+    """
+    env = os.environ.get
+    kw = dict(
+        pool_size=int(env("WP_POOL_SIZE", "8")),  # keep-alive connections to WP_BASE
+        rate_limit=float(env("WP_RATE_LIMIT", "2") or 0),  # writes (POST etc.) per second; 0 = unlimited
+        read_rate_limit=float(env("WP_READ_RATE_LIMIT", "0") or 0),  # GETs per second; caps paging when set
+        rate_burst=int(env("WP_RATE_BURST", "4")),
+        max_retries=int(env("WP_MAX_RETRIES", "4")),
+        backoff_base=float(env("WP_BACKOFF_BASE", "1.0")),  # seconds; doubles per retry, plus jitter
+        backoff_max=float(env("WP_BACKOFF_MAX", "60")),
+        fetch_workers=int(env("WP_FETCH_WORKERS", "4")),  # concurrent page fetches when listing posts
+    )
+    kw.update({k: v for k, v in overrides.items() if v is not None})
+    return WPClient(
+        env("WP_BASE", "").rstrip("/") if base is None else base,
+        env("WP_USERNAME", "") if username is None else username,
+        env("WP_APP_PASSWORD", "") if app_password is None else app_password,
+        **kw,
+    )
@@ -0,0 +1,231 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import cleanup, extract, ocr, ocr_rules, post_index, progress, utils, wp_client
+
+
+_DONE = object()
+
+
+def default_progress_log() -> str:
+    path = os.getenv("PROGRESS_LOG") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "progress_log.csv"
+    )
+    return path.strip()
+
+
+def positive_int(value: str) -> int:
+    """argparse type for stage and queue sizes: a stage with no workers would never drain its queue."""
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return n
+
+
+def split_title(text: str):
+    """First non-empty line becomes the title, the rest the content."""
+    lines = text.strip().split("\n")
+    for idx, line in enumerate(lines):
+        if line.strip():
+            title = " ".join(line.split())[:200]
+            return title, "\n".join(lines[idx + 1 :]).strip()
+    return "", ""
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.started = time.monotonic()
+
+    def bump(self, key: str, n: int = 1):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def line(self) -> str:
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            posted = self.counts.get("posted", 0) + self.counts.get("dry_run", 0)
+            rate = posted / elapsed * 60 if elapsed > 0 else 0.0
+            parts = ", ".join(f"{k}={v}" for k, v in sorted(self.counts.items()))
+            return f"{elapsed:.0f}s, {rate:.1f} posts/min ({parts})"
+
+
+def run_stage(name: str, fn, inbox: queue.Queue, outbox, workers: int, stats: Stats):
+    """Start `workers` threads applying fn to items from inbox; fn returns an item for outbox or None to drop it."""
+
+    def worker():
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                inbox.put(_DONE)  # let sibling workers see it too
+                return
+            try:
+                out = fn(item)
+            except Exception as e:
+                print(f"ERROR [{name}] {item['basename']}: {e}", file=sys.stderr)
+                stats.bump(f"{name}_error")
+                item["error"] = f"{name}: {e}"
+                out = None
+            if out is not None and outbox is not None:
+                outbox.put(out)
+
+    threads = [threading.Thread(target=worker, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def close_stage(threads, outbox):
+    for t in threads:
+        t.join()
+    if outbox is not None:
+        outbox.put(_DONE)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Publish catalog items to WordPress without the browser UI."
+    )
+    parser.add_argument("--source-root", default=os.getenv("SOURCE_ROOT", "").strip(), help="Default: SOURCE_ROOT.")
+    parser.add_argument("--progress-log", default=default_progress_log(), help="Default: PROGRESS_LOG or progress_log.csv.")
+    parser.add_argument("--years", default="", help="Comma-separated year folders to include (default: all).")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many items (default: no limit).")
+    parser.add_argument("--status", choices=["publish", "draft"], default="draft", help="WordPress post status (default: draft).")
+    parser.add_argument("--ocr", action="store_true", help="OCR PDF pages whose text layer fails the quality check.")
+    parser.add_argument("--fix-ocr", action="store_true",
+                        help="Apply the OCR_RULES post-correction to every extracted text, not just OCR'd PDFs.")
+    parser.add_argument("--extract-workers", type=positive_int, default=4)
+    parser.add_argument("--post-workers", type=positive_int, default=2)
+    parser.add_argument("--queue-size", type=positive_int, default=16, help="Bound on each inter-stage queue.")
+    parser.add_argument("--dry-run", action="store_true", help="Run every stage except the WordPress post; nothing is logged.")
+    parser.add_argument("--report-every", type=float, default=30.0, help="Seconds between progress lines.")
+    args = parser.parse_args()
+
+    if not args.source_root:
+        print("Missing SOURCE_ROOT (or --source-root).", file=sys.stderr)
+        return 1
+
+    store = progress.open_store(
+        os.getenv("PROGRESS_BACKEND", "csv"),
+        args.progress_log,
+        (os.getenv("PROGRESS_DB") or os.path.splitext(args.progress_log)[0] + ".sqlite3").strip(),
+    )
+    store.sync()
+    years = {y.strip() for y in args.years.split(",") if y.strip()}
+    items = [
+        it for it in utils.list_items(args.source_root, workers=4)
+        if it["basename"] not in store.done and (not years or it["year_folder"] in years)
+    ]
+    if args.limit:
+        items = items[: args.limit]
+    print(f"{len(items)} items to process ({len(store.done)} already done)")
+
+    index = None if args.dry_run else post_index.default_index()
+    publish = index.publish if index else wp_client.create_post
+
+    stats = Stats()
+    q_extract = queue.Queue(maxsize=args.queue_size)
+    q_clean = queue.Queue(maxsize=args.queue_size)
+    q_post = queue.Queue(maxsize=args.queue_size)
+    log_lock = threading.Lock()
+
+    rules = ocr_rules.default_rules() if (args.ocr or args.fix_ocr) else None
+
+    def do_extract(item):
+        used = {"ocr": False, "error": None}
+        def ocr_failed(e):
+            used["error"] = e
+        def pdf_loader(pdf_path):
+            pages = ocr.hybrid_pages(pdf_path, on_error=ocr_failed)
+            # --fix-ocr corrects the whole text below; otherwise only the pages OCR produced are corrected
+            text = ocr.join_pages(pages, correct=not args.fix_ocr)
+            # True only if some page was really OCR'd and this PDF text is used (not the DOCX fallback)
+            used["ocr"] = bool(text) and any(ocred for _, ocred in pages)
+            return text
+        item["text"] = extract.extract_item_text(item, pdf_loader=pdf_loader if args.ocr else None)
+        item["ocr_used"] = used["ocr"]
+        if rules and args.fix_ocr: item["text"] = rules.correct(item["text"])
+        stats.bump("extracted")
+        if used["error"] is not None:
+            stats.bump("ocr_error")
+            if not item["text"].strip():
+                raise RuntimeError(f"OCR failed and there is no text layer: {used['error']!r}")
+            print(f"WARNING [extract] {item['basename']}: OCR failed, using the text layer: {used['error']!r}", file=sys.stderr)
+        if not item["text"].strip():
+            stats.bump("empty")
+            return None
+        return item
+
+    def do_cleanup(item):
+        item["title"], item["content"] = split_title(cleanup.cleanup_text(item["text"]))
+        if not item["title"]:
+            stats.bump("empty")
+            return None
+        return item
+
+    def log(item, **row):
+        with log_lock:
+            store.append({
+                "year_folder": item["year_folder"], "basename": item["basename"],
+                "has_pdf": bool(item.get("pdf_path")), "has_docx": bool(item.get("docx_path")),
+                "date_parsed": item["date_parsed"], "title": item.get("title", ""),
+                "ocr_used": item.get("ocr_used", False), "cleanup_applied": True, **row,
+            })
+
+    def do_post(item):
+        if args.dry_run:
+            print(f"DRY RUN {item['basename']}: {item['title']!r} ({len(item['content'])} chars)")
+            stats.bump("dry_run")
+            return None
+        try:
+            res = publish(
+                title=item["title"], content=item["content"],
+                date_iso=utils.iso_local_noon(item["date_parsed"]), status=args.status,
+            )
+        except Exception as e:
+            log(item, status="error", author_set=False, wp_post_id="", wp_url="", error_message=str(e))
+            raise
+        log(item, status="published" if args.status == "publish" else "draft",
+            author_set=res.get("author_set", False), wp_post_id=res.get("id", ""), wp_url=res.get("URL", ""))
+        stats.bump("duplicate" if res.get("duplicate") else "posted")
+        return None
+
+    extract_threads = run_stage("extract", do_extract, q_extract, q_clean, args.extract_workers, stats)
+    cleanup_threads = run_stage("cleanup", do_cleanup, q_clean, q_post, 1, stats)
+    post_threads = run_stage("post", do_post, q_post, None, args.post_workers, stats)
+
+    def report():
+        while not finished.wait(args.report_every):
+            print(stats.line())
+
+    finished = threading.Event()
+    threading.Thread(target=report, daemon=True).start()
+
+    for item in items:
+        q_extract.put(item)  # blocks when the pipeline is full
+    q_extract.put(_DONE)
+    close_stage(extract_threads, q_clean)
+    close_stage(cleanup_threads, q_post)
+    close_stage(post_threads, None)
+    finished.set()
+
+    print(f"Finished: {stats.line()}")
+    if rules:
+        rs = rules.stats()
+        print(f"OCR rules: {rs['paragraphs']} paragraphs in {rs['documents']} texts (documents or OCR'd pages), {rs['dropped']} dropped")
+        for r in rs["rules"]:
+            print(f"  {r['name']}: {r['hits']} hits, {r['ms']:.1f} ms")
+    return 1 if any(k.endswith("_error") for k in stats.counts) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
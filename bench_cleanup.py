@@ -0,0 +1,103 @@
+import argparse
+import random
+import re
+import sys
+import time
+import unicodedata
+
+from app import cleanup
+
+
+# The multi-pass implementation cleanup_text replaced, kept verbatim as the reference.
+def legacy_fix_hyphenation(text: str) -> str:
+    return re.sub(r"(\w+)-\n(\w+)", r"\1\2", text)
+
+
+def legacy_normalize_unicode(text: str) -> str:
+    text = unicodedata.normalize("NFC", text)
+    for k, v in cleanup.LIGATURES.items():
+        text = text.replace(k, v)
+    for k, v in cleanup.GUILLEMETS.items():
+        text = text.replace(k, v)
+    text = text.replace("^^", "^")
+    text = re.sub(r"[ \t]+", " ", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text
+
+
+def legacy_cleanup_text(text: str) -> str:
+    return legacy_normalize_unicode(legacy_fix_hyphenation(text))
+
+
+WORDS = (
+    "the of and to in that is for it as was with be by on not this are or his from at which "
+    "but have an they you were her she there been one all we their has would when if so no "
+    "école café ﬁnance oﬂce schools federal education amendment congress"
+).split()
+# Fragments OCR output is full of: hyphenated breaks, ligatures, guillemets, tabs, CRLF, runs of blank lines
+NOISE = ["-\n", "-\r\n", "ﬁ", "ﬂ", "«", "»", "‹", "›", "\t", "  \t ",
+         "\r\n", "\r", "\n\n\n", "\n \n\n", "\r\n\r\n\r\n", "^^", "^^^", "é", " \n", "\n"]
+
+
+def sample_text(rng: random.Random, words: int) -> str:
+    parts = []
+    for _ in range(words):
+        parts.append(rng.choice(WORDS))
+        parts.append(rng.choice(NOISE) if rng.random() < 0.15 else " ")
+    return "".join(parts)
+
+
+def fuzz_text(rng: random.Random, length: int) -> str:
+    alphabet = ["a", "b", "-", " ", "\t", "\n", "\r", "^", "\ufb01", "\xab", "\xe9", "e\u0301", "\xb2", "\u0663", "_"]
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def bench(fn, texts, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check cleanup_text against the legacy multi-pass version and time both."
+    )
+    parser.add_argument("files", nargs="*", help="Extra UTF-8 text files (e.g. saved OCR output) to include.")
+    parser.add_argument("--docs", type=int, default=200, help="Synthetic OCR documents (default: 200).")
+    parser.add_argument("--words", type=int, default=1500, help="Words per synthetic document (default: 1500).")
+    parser.add_argument("--fuzz", type=int, default=20000, help="Short random strings checked for parity (default: 20000).")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts = [sample_text(rng, args.words) for _ in range(args.docs)]
+    for path in args.files:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            texts.append(f.read())
+
+    mismatches = 0
+    checks = texts + [fuzz_text(rng, rng.randint(0, 24)) for _ in range(args.fuzz)]
+    for text in checks:
+        if cleanup.cleanup_text(text) != legacy_cleanup_text(text):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH on {text[:80]!r}", file=sys.stderr)
+    print(f"Parity: {len(checks) - mismatches}/{len(checks)} inputs identical")
+
+    chars = sum(len(t) for t in texts)
+    old = bench(legacy_cleanup_text, texts, args.repeat)
+    new = bench(cleanup.cleanup_text, texts, args.repeat)
+    print(f"{len(texts)} documents, {chars / 1e6:.1f}M chars (best of {args.repeat})")
+    print(f"  legacy: {old * 1000:.1f} ms ({chars / old / 1e6:.1f}M chars/s)")
+    print(f"  engine: {new * 1000:.1f} ms ({chars / new / 1e6:.1f}M chars/s), {old / new:.2f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,15 +1,19 @@
 import argparse
+import bisect
 import csv
 import html
 import os
 import sys
+import time
 import zipfile
 from datetime import datetime
+from urllib.parse import parse_qsl, unquote, urlsplit
 from xml.etree import ElementTree as ET
 
-import requests
 from dotenv import load_dotenv
 
+from app.wp_rest import WPClient, client_from_env, read_json_response
+
 
 NS = {
     "office": "urn:oasis:names:tc:opendocument:xmlns:office:1.0",
@@ -18,48 +22,6 @@ NS = {
 }
 
 
-def build_session(username: str, app_password: str) -> requests.Session:
-    session = requests.Session()
-    session.auth = (username, app_password)
-    session.headers.update(
-        {
-            "User-Agent": (
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/91.0.4472.124 Safari/537.36"
-            ),
-            "Accept": "application/json, */*",
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept-Encoding": "gzip, deflate",
-            "DNT": "1",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-        }
-    )
-    return session
-
-
-def read_json_response(resp: requests.Response, context: str):
-    content_type = resp.headers.get("Content-Type", "")
-    if "application/json" not in content_type:
-        snippet = (resp.text or "").strip()[:500]
-        raise RuntimeError(
-            f"{context} returned non-JSON response "
-            f"(status {resp.status_code}, content-type '{content_type}'): {snippet}"
-        )
-    try:
-        return resp.json()
-    except ValueError:
-        try:
-            snippet = resp.content[:500].decode("utf-8", errors="replace")
-        except Exception:
-            snippet = (resp.text or "").strip()[:500]
-        raise RuntimeError(
-            f"{context} returned invalid JSON "
-            f"(status {resp.status_code}, content-type '{content_type}'): {snippet}"
-        )
-
-
 def normalize_month(value) -> int | None:
     if value is None:
         return None
@@ -123,33 +85,60 @@ def extract_cell_text(cell) -> str:
 
 
 def read_ods_rows(path: str):
+    """Yield the first table's non-empty rows as lists of cell strings, streaming content.xml.
+
+    Elements are cleared once their row is read, and repeated empty cells are
+    only expanded when a non-empty cell follows them in the same row, so the
+    trailing blank repeats spreadsheets pad rows and sheets with cost nothing.
+    """
     if not os.path.exists(path):
         raise FileNotFoundError(f"ODS not found: {path}")
+    table_tag = f"{{{NS['table']}}}table"
+    row_tag = f"{{{NS['table']}}}table-row"
+    cell_tag = f"{{{NS['table']}}}table-cell"
+    rows_repeated = f"{{{NS['table']}}}number-rows-repeated"
+    cols_repeated = f"{{{NS['table']}}}number-columns-repeated"
+
     with zipfile.ZipFile(path) as zf:
         with zf.open("content.xml") as handle:
-            tree = ET.parse(handle)
-    root = tree.getroot()
-    table = root.find(".//table:table", NS)
+            depth = 0
+            table = None
+            table_depth = 0
+            in_row = False
+            row_cells = []
+            pending_blanks = 0
+            for event, elem in ET.iterparse(handle, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if table is None and elem.tag == table_tag:
+                        table, table_depth = elem, depth
+                    elif table is not None and elem.tag == row_tag and depth == table_depth + 1:
+                        in_row, row_cells, pending_blanks = True, [], 0
+                    continue
+                depth -= 1
+                if table is None:
+                    continue
+                if in_row and elem.tag == cell_tag and depth == table_depth + 1:
+                    repeat = int(elem.get(cols_repeated, "1"))
+                    value = extract_cell_text(elem)
+                    if value.strip():
+                        row_cells.extend([""] * pending_blanks)
+                        row_cells.extend([value] * repeat)
+                        pending_blanks = 0
+                    else:
+                        pending_blanks += repeat
+                    elem.clear()
+                elif in_row and elem.tag == row_tag and depth == table_depth:
+                    in_row = False
+                    if row_cells:
+                        for _ in range(int(elem.get(rows_repeated, "1"))):
+                            yield row_cells[:]
+                    table.clear()
+                elif elem is table:
+                    return
     if table is None:
         raise RuntimeError("No table found in ODS content.xml")
 
-    rows = []
-    for row in table.findall("table:table-row", NS):
-        row_repeat = int(
-            row.get(f"{{{NS['table']}}}number-rows-repeated", "1")
-        )
-        row_cells = []
-        for cell in row.findall("table:table-cell", NS):
-            repeat = int(
-                cell.get(f"{{{NS['table']}}}number-columns-repeated", "1")
-            )
-            value = extract_cell_text(cell)
-            row_cells.extend([value] * repeat)
-        if any(cell.strip() for cell in row_cells):
-            for _ in range(row_repeat):
-                rows.append(row_cells[:])
-    return rows
-
 
 def build_headers(header_row, width: int):
     headers = []
@@ -167,12 +156,14 @@ def build_headers(header_row, width: int):
 
 def parse_ods(path: str):
     rows = read_ods_rows(path)
-    if not rows:
+    header_row = next(rows, None)
+    if header_row is None:
         raise RuntimeError("ODS has no rows")
-    width = max(len(r) for r in rows)
-    headers = build_headers(rows[0], width)
+    body = list(rows)
+    width = max([len(header_row)] + [len(r) for r in body])
+    headers = build_headers(header_row, width)
     data_rows = []
-    for raw in rows[1:]:
+    for raw in body:
         padded = raw + [""] * (width - len(raw))
         row = {headers[i]: padded[i] for i in range(width)}
         data_rows.append(row)
@@ -180,22 +171,19 @@ def parse_ods(path: str):
 
 
 def resolve_category_id(
-    session: requests.Session,
-    api_base: str,
+    client: WPClient,
     category_slug: str,
     fallback_id: int | None,
 ):
     slug_params = {"slug": category_slug, "per_page": 100}
-    resp = session.get(f"{api_base}/categories", params=slug_params, timeout=30)
+    resp = client.request("GET", "categories", params=slug_params, timeout=30)
     if resp.ok:
         cats = read_json_response(resp, "Categories (slug)")
         if cats:
             return cats[0].get("id")
 
     search_params = {"search": category_slug, "per_page": 100}
-    resp = session.get(
-        f"{api_base}/categories", params=search_params, timeout=30
-    )
+    resp = client.request("GET", "categories", params=search_params, timeout=30)
     if resp.ok:
         cats = read_json_response(resp, "Categories (search)")
         for cat in cats:
@@ -207,31 +195,11 @@ def resolve_category_id(
     return fallback_id
 
 
-def fetch_posts(session: requests.Session, api_base: str, category_id: int, status: str):
-    posts = []
-    page = 1
-    per_page = 100
-    total_pages = 1
-
-    while page <= total_pages:
-        params = {
-            "categories": category_id,
-            "per_page": per_page,
-            "page": page,
-            "status": status,
-            "_fields": "id,title,date,link,author,_embedded",
-            "_embed": "author",
-        }
-        resp = session.get(f"{api_base}/posts", params=params, timeout=45)
-        resp.raise_for_status()
-        total_pages = int(resp.headers.get("X-WP-TotalPages", "1"))
-        page_posts = read_json_response(resp, "Posts list")
-        if not page_posts:
-            break
-        posts.extend(page_posts)
-        page += 1
-
-    return posts
+POST_FIELDS = "id,title,date,link,author,_embedded"
+
+
+def fetch_posts(client: WPClient, category_id: int, status: str):
+    return client.fetch_posts(category_id, status, POST_FIELDS, _embed="author")
 
 
 def post_author_name(post) -> str:
@@ -259,10 +227,146 @@ def links_match(post_link: str, issue_link: str) -> bool:
     return post_link in issue_link or issue_link in post_link
 
 
-def match_posts_to_issues(posts, issue_rows, issue_link_key: str):
+# Query parameters that identify a post on permalink-less WordPress URLs (/?p=12, /?page_id=3)
+ID_QUERY_PARAMS = ("p", "page_id")
+
+
+def canonical_link(link: str) -> str:
+    """host/path, lowercased, without scheme, www., fragment or trailing slash.
+
+    The query is dropped except for ID_QUERY_PARAMS, so x.com/?p=12 and
+    x.com/?p=11 stay distinct.
+    """
+    link = (link or "").strip()
+    if not link:
+        return ""
+    parts = urlsplit(link if "//" in link else f"//{link}")
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = unquote(parts.path).rstrip("/").lower()
+    ids = sorted((k, v) for k, v in parse_qsl(parts.query) if k in ID_QUERY_PARAMS)
+    query = "&".join(f"{k}={v.lower()}" for k, v in ids)
+    return f"{host}{path}?{query}" if query else f"{host}{path}"
+
+
+def link_slug(key: str) -> str:
+    return key.rsplit("/", 1)[-1] if "/" in key else ""
+
+
+def link_trigrams(link: str) -> set:
+    return {link[i:i + 3] for i in range(len(link) - 2)}
+
+
+class IssueIndex:
+    """Issues of one month bucket, looked up by canonical link instead of a scan.
+
+    take() gives a post the earliest free issue with the same canonical key,
+    else the same last path segment (slug), else a whole-segment prefix in
+    either direction (not for ?p= style keys, whose id is the whole identity).
+    Only a post with no free issue there falls back to the scan's test: any
+    issue whose raw link links_match()es the post's, found through a trigram
+    index. Slug and trigram candidates are confirmed with links_match.
+    """
+
+    def __init__(self, issues, issue_link_key: str):
+        self.issues = issues
+        self.link_key = issue_link_key
+        self.taken = [False] * len(issues)
+        self.by_key = {}
+        self.by_slug = {}
+        self.keys = []
+        self.by_gram = {}
+        self.by_rarest = {}  # each issue under its least common trigram
+        self.short = []  # links too short to have a trigram; only a scan can match them
+        issue_grams = []
+        for idx, issue in enumerate(issues):
+            link = issue.get(issue_link_key, "")
+            key = canonical_link(link)
+            grams = link_trigrams(link) if key else set()
+            issue_grams.append(grams)
+            if not key:
+                continue
+            self.by_key.setdefault(key, []).append(idx)
+            slug = link_slug(key)
+            if slug:
+                self.by_slug.setdefault(slug, []).append(idx)
+            if "?" not in key:
+                self.keys.append((key, idx))
+            if not grams:
+                self.short.append(idx)
+            for gram in grams:
+                self.by_gram.setdefault(gram, []).append(idx)
+        self.keys.sort()
+        for idx, grams in enumerate(issue_grams):
+            if grams:
+                rarest = min(grams, key=lambda g: len(self.by_gram[g]))
+                self.by_rarest.setdefault(rarest, []).append(idx)
+
+    def _prefix_candidates(self, key: str):
+        if "?" in key:
+            return
+        # Issues whose key extends the post's key by whole path segments
+        lo = bisect.bisect_left(self.keys, (key + "/", -1))
+        for issue_key, idx in self.keys[lo:]:
+            if not issue_key.startswith(key + "/"):
+                break
+            yield idx
+        # Issues whose key the post's key extends, at path-segment boundaries
+        prefix = key
+        while "/" in prefix:
+            prefix = prefix.rsplit("/", 1)[0]
+            yield from self.by_key.get(prefix, ())
+
+    def _substring_candidates(self, post_link: str):
+        """Issues whose raw link might contain, or be contained in, post_link (a superset; confirm with links_match)."""
+        grams = link_trigrams(post_link)
+        if not grams:
+            return range(len(self.issues))  # too short to index; scan
+        # An issue link containing the post link has all its trigrams, including the least common one
+        rarest = min(grams, key=lambda g: len(self.by_gram.get(g, ())))
+        found = set(self.by_gram.get(rarest, ()))
+        # A post link containing an issue link has all of that issue's trigrams, including its rarest
+        for gram in grams:
+            found.update(self.by_rarest.get(gram, ()))
+        found.update(self.short)
+        return sorted(found)
+
+    def _indexed_candidates(self, key: str, confirm):
+        yield from ((idx, "exact") for idx in self.by_key.get(key, ()))
+        yield from ((idx, "slug") for idx in self.by_slug.get(link_slug(key), ()) if confirm(idx))
+        yield from ((idx, "prefix") for idx in sorted(self._prefix_candidates(key)))
+
+    def take(self, post_link: str):
+        """Claim the best free issue for post_link; (issue, how) or (None, None)."""
+        key = canonical_link(post_link)
+        if not key:
+            return None, None
+        confirm = lambda i: links_match(post_link, self.issues[i].get(self.link_key, ""))
+        for idx, how in self._indexed_candidates(key, confirm):
+            if not self.taken[idx]:
+                self.taken[idx] = True
+                return self.issues[idx], how
+        for idx in self._substring_candidates(post_link):
+            if not self.taken[idx] and confirm(idx):
+                self.taken[idx] = True
+                return self.issues[idx], "substring"
+        return None, None
+
+    def remaining(self):
+        return [issue for idx, issue in enumerate(self.issues) if not self.taken[idx]]
+
+
+def match_posts_to_issues(posts, issue_rows, issue_link_key: str, stats=None):
+    """Pair posts with issues of the same year-month whose links agree.
+
+    stats, if given, is filled with per-strategy match counts and elapsed_ms.
+    """
+    t0 = time.perf_counter()
     matches = []
     unmatched_posts = []
     unmatched_issues = []
+    counts = {"exact": 0, "slug": 0, "prefix": 0, "substring": 0}
 
     posts_by_key = {}
     for post in posts:
@@ -275,7 +379,7 @@ def match_posts_to_issues(posts, issue_rows, issue_link_key: str):
         issues_by_key.setdefault(key, []).append(issue)
 
     all_keys = set(posts_by_key) | set(issues_by_key)
-    for key in sorted(all_keys):
+    for key in sorted(all_keys, key=lambda k: (k is None, k or "")):
         key_posts = posts_by_key.get(key, [])
         key_issues = issues_by_key.get(key, [])
         if not key_posts:
@@ -285,21 +389,26 @@ def match_posts_to_issues(posts, issue_rows, issue_link_key: str):
             unmatched_posts.extend(key_posts)
             continue
 
-        remaining_issues = key_issues[:]
+        index = IssueIndex(key_issues, issue_link_key)
         for post in key_posts:
-            post_link = post.get("link", "")
-            match_idx = None
-            for idx, issue in enumerate(remaining_issues):
-                if links_match(post_link, issue.get(issue_link_key, "")):
-                    match_idx = idx
-                    break
-            if match_idx is None:
+            issue, how = index.take(post.get("link", ""))
+            if issue is None:
                 unmatched_posts.append(post)
             else:
-                matches.append((post, remaining_issues.pop(match_idx)))
-        if remaining_issues:
-            unmatched_issues.extend(remaining_issues)
-
+                counts[how] += 1
+                matches.append((post, issue))
+        unmatched_issues.extend(index.remaining())
+
+    if stats is not None:
+        stats.update(counts)
+        stats.update({
+            "posts": len(posts),
+            "issues": len(issue_rows),
+            "matched": len(matches),
+            "unmatched_posts": len(unmatched_posts),
+            "unmatched_issues": len(unmatched_issues),
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+        })
     return matches, unmatched_posts, unmatched_issues
 
 
@@ -324,6 +433,12 @@ def main():
         default="publish",
         help="Post status to query (default: publish).",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Concurrent page fetches (default: WP_FETCH_WORKERS or 4).",
+    )
     parser.add_argument(
         "--matched-output",
         default="education_reporter_matched.csv",
@@ -349,11 +464,8 @@ def main():
         )
         return 1
 
-    api_base = f"{wp_base}/wp-json/wp/v2"
-    session = build_session(username, app_password)
-    category_id = resolve_category_id(
-        session, api_base, args.category_slug, fallback_category_id
-    )
+    client = client_from_env(wp_base, username, app_password, fetch_workers=args.workers)
+    category_id = resolve_category_id(client, args.category_slug, fallback_category_id)
     if not category_id:
         print(
             f"Could not resolve category '{args.category_slug}'.",
@@ -361,7 +473,7 @@ def main():
         )
         return 1
 
-    posts = fetch_posts(session, api_base, category_id, args.status)
+    posts = fetch_posts(client, category_id, args.status)
 
     ods_headers, ods_rows = parse_ods(args.ods_path)
     if len(ods_headers) < 9:
@@ -380,8 +492,14 @@ def main():
             }
         )
 
+    match_stats = {}
     matches, unmatched_posts, unmatched_issues = match_posts_to_issues(
-        posts, issue_rows, "link"
+        posts, issue_rows, "link", stats=match_stats
+    )
+    print(
+        f"Matched {match_stats['matched']} of {match_stats['posts']} posts "
+        f"(exact {match_stats['exact']}, slug {match_stats['slug']}, "
+        f"prefix {match_stats['prefix']}, substring {match_stats['substring']}) in {match_stats['elapsed_ms']} ms"
     )
 
     ods_prefixed_headers = [f"ods_{h}" for h in ods_headers]
@@ -443,6 +561,8 @@ def main():
         f"Wrote {len(unmatched_posts) + len(unmatched_issues)} unmatched rows "
         f"to {args.unmatched_output}"
     )
+    for line in client.metrics_lines():
+        print(f"  {line}")
     return 0
 
 
@@ -5,98 +5,10 @@ import io
 import os
 import sys
 
-import requests
 from dotenv import load_dotenv
 
-
-def build_session(username: str, app_password: str) -> requests.Session:
-    session = requests.Session()
-    session.auth = (username, app_password)
-    session.headers.update(
-        {
-            "User-Agent": (
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/91.0.4472.124 Safari/537.36"
-            ),
-            "Accept": "application/json, */*",
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept-Encoding": "gzip, deflate",
-            "DNT": "1",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-        }
-    )
-    return session
-
-
-def chunked(seq, size: int):
-    for i in range(0, len(seq), size):
-        yield seq[i : i + size]
-
-
-def read_json_response(resp: requests.Response, context: str):
-    content_type = resp.headers.get("Content-Type", "")
-    if "application/json" not in content_type:
-        snippet = (resp.text or "").strip()[:500]
-        raise RuntimeError(
-            f"{context} returned non-JSON response "
-            f"(status {resp.status_code}, content-type '{content_type}'): {snippet}"
-        )
-    try:
-        return resp.json()
-    except ValueError:
-        try:
-            snippet = resp.content[:500].decode("utf-8", errors="replace")
-        except Exception:
-            snippet = (resp.text or "").strip()[:500]
-        raise RuntimeError(
-            f"{context} returned invalid JSON "
-            f"(status {resp.status_code}, content-type '{content_type}'): {snippet}"
-        )
-
-
-def fetch_posts(session: requests.Session, api_base: str, category_id: int, status: str):
-    posts = []
-    page = 1
-    per_page = 100
-    total_pages = 1
-
-    while page <= total_pages:
-        params = {
-            "categories": category_id,
-            "per_page": per_page,
-            "page": page,
-            "status": status,
-            "_fields": "id,title,date,categories,link",
-        }
-        resp = session.get(f"{api_base}/posts", params=params, timeout=45)
-        resp.raise_for_status()
-        total_pages = int(resp.headers.get("X-WP-TotalPages", "1"))
-        page_posts = read_json_response(resp, "Posts list")
-        if not page_posts:
-            break
-        posts.extend(page_posts)
-        page += 1
-
-    return posts
-
-
-def fetch_category_map(session: requests.Session, api_base: str, category_ids):
-    if not category_ids:
-        return {}
-    cat_map = {}
-    for group in chunked(list(category_ids), 100):
-        params = {
-            "include": ",".join(str(cid) for cid in group),
-            "per_page": 100,
-            "_fields": "id,name",
-        }
-        resp = session.get(f"{api_base}/categories", params=params, timeout=30)
-        resp.raise_for_status()
-        for cat in read_json_response(resp, "Categories list"):
-            cat_map[cat.get("id")] = cat.get("name", "")
-    return cat_map
+from app.wp_mirror import MIRROR_STATUSES, PostMirror
+from app.wp_rest import WPClient, client_from_env
 
 
 def build_csv(posts, category_id: int, cat_map) -> str:
@@ -148,6 +60,25 @@ def main():
         default="publish",
         help="Post status to query (default: publish).",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Concurrent page fetches (default: WP_FETCH_WORKERS or 4).",
+    )
+    parser.add_argument(
+        "--mirror",
+        default="",
+        help=(
+            "SQLite mirror path. When set, only posts modified since the last run "
+            "are fetched and the CSV is written from the mirror."
+        ),
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="With --mirror, refetch the whole category instead of the delta.",
+    )
     parser.add_argument(
         "--output",
         default="",
@@ -166,14 +97,24 @@ def main():
         )
         return 1
 
-    api_base = f"{wp_base}/wp-json/wp/v2"
-    session = build_session(username, app_password)
+    client = client_from_env(wp_base, username, app_password, fetch_workers=args.workers)
 
-    posts = fetch_posts(session, api_base, args.category_id, args.status)
+    if args.mirror and args.status in MIRROR_STATUSES.split(","):
+        mirror = PostMirror(args.mirror)
+        stats = client.sync_mirror(mirror, args.category_id, args.full)
+        print(
+            f"Mirror {stats['mode']} sync: fetched {stats['fetched']} posts "
+            f"in {stats['elapsed_ms'] / 1000:.1f}s"
+        )
+        posts = [
+            p for page in mirror.iter_pages(args.category_id, args.status) for p in page
+        ]
+    else:
+        posts = client.fetch_posts(args.category_id, args.status)
     other_cat_ids = {
         cid for p in posts for cid in p.get("categories", []) if cid != args.category_id
     }
-    cat_map = fetch_category_map(session, api_base, other_cat_ids)
+    cat_map = client.fetch_category_map(other_cat_ids)
 
     csv_text = build_csv(posts, args.category_id, cat_map)
     output_path = args.output or f"wp_posts_category_{args.category_id}.csv"
@@ -181,6 +122,8 @@ def main():
         f.write(csv_text)
 
     print(f"Wrote {len(posts)} posts to {output_path}")
+    for line in client.metrics_lines():
+        print(f"  {line}")
     return 0
 
 
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("requests")
+
+import export_education_reporter_matches as er
+from export_education_reporter_matches import links_match
+
+
+def post(link, date="2020-01-15T12:00:00"):
+    return {"id": link, "link": link, "date": date}
+
+
+def issue(link, year=2020, month=1):
+    return {"link": link, "year": year, "month": month}
+
+
+def matched_pairs(matches):
+    return {(p["link"], i["link"]) for p, i in matches}
+
+
+def test_canonical_link_keeps_permalink_ids():
+    assert er.canonical_link("https://www.X.com/?p=12&utm_source=feed") == "x.com?p=12"
+    assert er.canonical_link("http://x.com/?page_id=3#top") == "x.com?page_id=3"
+    assert er.canonical_link("https://x.com/2020/01/foo/?utm_source=feed") == "x.com/2020/01/foo"
+
+
+def test_query_permalinks_do_not_collide():
+    posts = [post("https://x.com/?p=12")]
+    issues = [issue("https://x.com/?p=11"), issue("https://x.com/?p=12")]
+    matches, unmatched_posts, _ = er.match_posts_to_issues(posts, issues, "link")
+    assert matched_pairs(matches) == {("https://x.com/?p=12", "https://x.com/?p=12")}
+    assert not unmatched_posts
+
+
+def test_substring_fallback_matches_like_the_scan():
+    posts = [post("x.com/2020/01/foo-bar")]
+    issues = [issue("x.com/2020/01/foo-bar-2")]
+    stats = {}
+    matches, _, _ = er.match_posts_to_issues(posts, issues, "link", stats=stats)
+    assert matched_pairs(matches) == {("x.com/2020/01/foo-bar", "x.com/2020/01/foo-bar-2")}
+    assert stats["substring"] == 1
+
+
+def random_links(rng, count):
+    hosts = ["https://x.com", "http://www.x.com", "x.com", "https://edreporter.org"]
+    slugs = ["foo", "foo-bar", "foo-bar-2", "bar", "school-choice", "school-choice-2", "tax", "reading"]
+    links = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.2:
+            links.append(f"{rng.choice(hosts)}/?p={rng.randint(1, 30)}")
+        elif kind < 0.3:
+            links.append(f"{rng.choice(hosts)}/{rng.choice(slugs)}")
+        else:
+            path = f"/2020/01/{rng.choice(slugs)}"
+            links.append(f"{rng.choice(hosts)}{path}{rng.choice(['', '/', '/?utm_source=feed'])}")
+    return links
+
+
+def test_exact_key_wins_over_an_earlier_substring_match():
+    posts = [post("https://x.com/2020/01/foo"), post("https://x.com/2020/01/foo-bar")]
+    issues = [issue("https://x.com/2020/01/foo-bar"), issue("http://www.x.com/2020/01/foo/")]
+    matches, unmatched_posts, _ = er.match_posts_to_issues(posts, issues, "link")
+    assert matched_pairs(matches) == {
+        ("https://x.com/2020/01/foo", "http://www.x.com/2020/01/foo/"),
+        ("https://x.com/2020/01/foo-bar", "https://x.com/2020/01/foo-bar"),
+    }
+    assert not unmatched_posts
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_unmatched_posts_have_no_free_issue(seed):
+    rng = random.Random(seed)
+    posts = [post(link) for link in random_links(rng, 60)]
+    issues = [issue(link) for link in random_links(rng, 60)]
+
+    matches, unmatched_posts, unmatched_issues = er.match_posts_to_issues(posts, issues, "link")
+
+    assert len(matches) + len(unmatched_posts) == len(posts)
+    assert len(matches) + len(unmatched_issues) == len(issues)
+    assert len({id(i) for _, i in matches}) == len(matches)
+    # Greedy first-free: a post left out found every issue it matches already taken
+    for p in unmatched_posts:
+        assert not any(links_match(p["link"], i["link"]) for i in unmatched_issues)
@@ -0,0 +1,131 @@
+import importlib
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+# app.ocr imports app.extract, which needs PyMuPDF and mammoth; pdf2image and pytesseract are mocked below
+pytest.importorskip("fitz")
+pytest.importorskip("mammoth")
+
+PAGES = 12
+POOL_SIZE = 4
+
+
+class Bitmaps:
+    """Counts page bitmaps handed out by the fake convert_from_path and not yet closed."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.alive = 0
+        self.peak = 0
+        self.calls = []
+
+    def convert_from_path(self, pdf_path, dpi=200, first_page=None, last_page=None, grayscale=False, **kw):
+        with self.lock:
+            self.calls.append((first_page, last_page))
+            count = (last_page or PAGES) - (first_page or 1) + 1
+            self.alive += count
+            self.peak = max(self.peak, self.alive)
+        return [Bitmap(self, first_page) for _ in range(count)]
+
+
+class Bitmap:
+    def __init__(self, owner, page_no):
+        self.owner = owner
+        self.page_no = page_no
+        self.closed = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            with self.owner.lock:
+                self.owner.alive -= 1
+
+
+@pytest.fixture
+def ocr(monkeypatch):
+    bitmaps = Bitmaps()
+    pdf2image = types.ModuleType("pdf2image")
+    pdf2image.convert_from_path = bitmaps.convert_from_path
+    pdf2image.pdfinfo_from_path = lambda path: {"Pages": PAGES}
+    pytesseract = types.ModuleType("pytesseract")
+
+    def image_to_string(image, lang=None, config=""):
+        time.sleep(0.01)  # long enough for pages to overlap when they can
+        return f"page {image.page_no}"
+
+    pytesseract.image_to_string = image_to_string
+    monkeypatch.setitem(sys.modules, "pdf2image", pdf2image)
+    monkeypatch.setitem(sys.modules, "pytesseract", pytesseract)
+    monkeypatch.delitem(sys.modules, "app.ocr", raising=False)
+    module = importlib.import_module("app.ocr")
+    # Threads instead of processes, so the mocks above are what the workers call
+    pool = ThreadPoolExecutor(max_workers=POOL_SIZE)
+    monkeypatch.setattr(module, "_get_pool", lambda: pool)
+    monkeypatch.setattr(module, "OCR_WORKERS", POOL_SIZE)
+    yield module, bitmaps
+    pool.shutdown(wait=True)
+
+
+@pytest.mark.parametrize("workers", [1, 2, 3, 4])
+def test_each_call_renders_a_single_page(ocr, workers):
+    module, bitmaps = ocr
+    pages = module._ocr_pages("doc.pdf", list(range(1, PAGES + 1)), workers=workers, timeout=0, progress=None)
+    assert pages == {n: f"page {n}" for n in range(1, PAGES + 1)}
+    assert all(first is not None and first == last for first, last in bitmaps.calls)
+    assert sorted(first for first, _ in bitmaps.calls) == list(range(1, PAGES + 1))
+
+
+@pytest.mark.parametrize("workers", [1, 2, 3, 4])
+def test_bitmaps_alive_never_exceed_workers(ocr, workers):
+    module, bitmaps = ocr
+    module.ocr_pdf_to_text("doc.pdf", workers=workers, timeout=0, use_cache=False, correct=False)
+    assert bitmaps.alive == 0
+    assert 1 <= bitmaps.peak <= workers
+
+
+def test_request_workers_capped_by_pool(ocr):
+    module, bitmaps = ocr
+    module.ocr_pdf_to_text("doc.pdf", workers=POOL_SIZE * 4, timeout=0, use_cache=False, correct=False)
+    assert bitmaps.peak <= POOL_SIZE
+
+
+def test_broken_pool_is_replaced(ocr, monkeypatch):
+    module, _ = ocr
+
+    class BrokenPool:
+        shut_down = False
+
+        def submit(self, *args, **kwargs):
+            raise BrokenProcessPool("A worker process terminated abruptly")
+
+        def shutdown(self, **kwargs):
+            self.shut_down = True
+
+    broken = BrokenPool()
+    monkeypatch.setattr(module, "_pool", broken)
+    monkeypatch.setattr(module, "_get_pool", lambda: module._pool)
+    with pytest.raises(BrokenProcessPool):
+        module._ocr_pages("doc.pdf", [1, 2], workers=2, timeout=0, progress=None)
+    assert module._pool is None
+    assert broken.shut_down
+
+
+def test_failed_ocr_keeps_the_text_layer(ocr, monkeypatch):
+    module, _ = ocr
+    short_page = "A short but clean page."
+    monkeypatch.setattr(module.extract, "extract_pdf_pages", lambda path: [short_page])
+
+    def broken_ocr(*args, **kwargs):
+        raise TimeoutError("OCR of doc.pdf exceeded 600s")
+
+    monkeypatch.setattr(module, "_ocr_pages", broken_ocr)
+    errors = []
+    text = module.ocr_pdf_hybrid("doc.pdf", use_cache=False, on_error=errors.append)
+    assert text == short_page
+    assert len(errors) == 1 and isinstance(errors[0], TimeoutError)
@@ -0,0 +1,24 @@
+import threading
+import time
+
+from app import post_index
+
+
+def test_concurrent_refresh_on_fresh_index_fetches_once(monkeypatch):
+    calls = []
+
+    def fetch_posts_by_category(category_id, status="publish", modified_after=None, fields=None):
+        calls.append(modified_after)
+        time.sleep(0.1)  # long enough for the other publishers to queue on the lock
+        return [{"id": 1, "title": {"rendered": "Hello"}, "date": "1976-01-02T12:00:00",
+                 "link": "https://example.org/hello", "status": "publish", "modified": "1976-01-02T12:00:00"}]
+
+    monkeypatch.setattr(post_index.wp_client, "fetch_posts_by_category", fetch_posts_by_category)
+    index = post_index.PostIndex(72)
+    threads = [threading.Thread(target=index.lookup, args=("1976-01-03", "Missing")) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == [None]
+    assert index.lookup("1976-01-02", "Hello")["id"] == 1
@@ -0,0 +1,43 @@
+import threading
+
+from app.prefetch import TextPrefetcher, _key
+
+
+def slow_loader(release):
+    def load(item):
+        release.wait(5)
+        return f"ocr {item['basename']}"
+    return load
+
+
+def plain(item):
+    return f"layer {item['basename']}"
+
+
+def test_fallback_answers_a_miss_and_loads_in_background():
+    release = threading.Event()
+    prefetcher = TextPrefetcher(slow_loader(release))
+    item = {"basename": "a"}
+    assert prefetcher.get(item, fallback=plain) == "layer a"
+    future = prefetcher._pending.get(_key(item))
+    release.set()
+    if future is not None:
+        future.result(5)
+    assert prefetcher.get(item, fallback=plain) == "ocr a"
+
+
+def test_fallback_does_not_wait_on_an_unfinished_extraction():
+    release = threading.Event()
+    prefetcher = TextPrefetcher(slow_loader(release))
+    item = {"basename": "b"}
+    prefetcher.prefetch([item])
+    assert prefetcher.get(item, fallback=plain) == "layer b"
+    assert prefetcher.stats()["fallbacks"] == 1
+    release.set()
+
+
+def test_without_fallback_waits_for_the_loader():
+    release = threading.Event()
+    release.set()
+    prefetcher = TextPrefetcher(slow_loader(release))
+    assert prefetcher.get({"basename": "c"}) == "ocr c"
@@ -0,0 +1,14 @@
+from app import wp_client
+
+HEADER = "post_id,title,published_date,additional_category_ids,additional_category_names\r\n"
+
+
+def test_empty_category_exports_the_header():
+    assert list(wp_client.iter_posts_csv(72, pages=iter([]))) == [HEADER]
+
+
+def test_header_then_one_chunk_per_page(monkeypatch):
+    monkeypatch.setattr(wp_client, "category_names", lambda ids: {5: "News"})
+    pages = [[{"id": 1, "title": {"rendered": "A &amp; B"}, "date": "1976-01-02T12:00:00", "categories": [72, 5]}]]
+    chunks = list(wp_client.iter_posts_csv(72, pages=iter(pages)))
+    assert chunks == [HEADER, "1,A & B,1976-01-02T12:00:00,5,News\r\n"]
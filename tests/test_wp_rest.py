@@ -0,0 +1,91 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from app.wp_rest import WPClient, client_from_env, iter_pages
+
+
+class FakeSession:
+    """Stands in for requests.Session: raises the queued exceptions, then answers 201."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        resp = requests.Response()
+        resp.status_code = 201
+        return resp
+
+
+def client_with(errors):
+    client = WPClient("https://example.org", "user", "pass", max_retries=2, backoff_base=0)
+    client.session = FakeSession(errors)
+    return client
+
+
+def refused():
+    reason = NewConnectionError(None, "Failed to establish a new connection: [Errno 111] Connection refused")
+    return requests.ConnectionError(MaxRetryError(None, "/wp-json/wp/v2/posts", reason))
+
+
+def test_post_resent_when_never_sent():
+    client = client_with([refused(), requests.ConnectTimeout()])
+    assert client.request("POST", "posts", json={}).status_code == 201
+    assert client.session.calls == 3
+
+
+@pytest.mark.parametrize("error", [
+    requests.ConnectionError("Connection aborted.", "RemoteDisconnected('Remote end closed connection')"),
+    requests.ReadTimeout(),
+])
+def test_post_not_resent_once_it_may_have_arrived(error):
+    client = client_with([error])
+    with pytest.raises(type(error)):
+        client.request("POST", "posts", json={})
+    assert client.session.calls == 1
+
+
+def test_get_resent_after_dropped_connection():
+    client = client_with([requests.ConnectionError("Connection aborted.")])
+    assert client.request("GET", "posts").status_code == 201
+    assert client.session.calls == 2
+
+
+def test_page_errors_retried_by_request_are_not_retried_again():
+    calls = []
+
+    def get_page(page):
+        calls.append(page)
+        raise requests.HTTPError("503 Server Error")
+
+    with pytest.raises(requests.HTTPError):
+        list(iter_pages(get_page, workers=1, retries=2, backoff=0))
+    assert calls == [1]
+
+
+def test_page_with_a_non_json_body_is_fetched_again():
+    calls = []
+
+    def get_page(page):
+        calls.append(page)
+        if len(calls) == 1:
+            raise RuntimeError("Posts list (page 1) returned non-JSON response")
+        return [{"id": 1}], 1
+
+    assert list(iter_pages(get_page, workers=1, retries=2, backoff=0)) == [[{"id": 1}]]
+    assert calls == [1, 1]
+
+
+def test_client_from_env_reads_settings_at_call_time(monkeypatch):
+    monkeypatch.setenv("WP_BASE", "https://example.org/")
+    monkeypatch.setenv("WP_MAX_RETRIES", "9")
+    monkeypatch.setenv("WP_FETCH_WORKERS", "6")
+    client = client_from_env()
+    assert client.api == "https://example.org/wp-json/wp/v2"
+    assert client.max_retries == 9 and client.fetch_workers == 6
+    assert client_from_env(fetch_workers=2).fetch_workers == 2
+    assert client_from_env(fetch_workers=None).fetch_workers == 6